@@ -21,12 +21,11 @@ Advantages of this implementation:
 """
 
 
-import numpy as np
-import random
+import time
 import tensorflow as tf
-import tensorflow.contrib.layers as layers
-
-map_fn = tf.map_fn
+from rnn_layers import StackedRnn, timeDistributedLinear
+from dtype_policy import DtypePolicy
+from binary_data import additionBatch, BucketedSampler
 
 ################################################################################
 ##                           DATASET GENERATION                               ##
@@ -37,23 +36,8 @@ map_fn = tf.map_fn
 ##  corresponds to bit len(number) - t.                                       ##
 ################################################################################
 
-def as_bytes(num, final_size):
-    res = []
-    for _ in range(final_size):
-        res.append(num % 2)
-        num //= 2
-    return res
-
-def generate_example(num_bits):
-    a = random.randint(0, 2**(num_bits - 1) - 1)
-    b = random.randint(0, 2**(num_bits - 1) - 1)
-    res = a + b
-    return (as_bytes(a,  num_bits),
-            as_bytes(b,  num_bits),
-            as_bytes(res,num_bits))
-
-def generate_batch(num_bits, batch_size):
-    """Generates instance of a problem.
+def generate_batch(num_bits, batch_size, dtype):
+    """Generates instance of a problem, as dtype arrays.
     Returns
     -------
     x: np.array
@@ -72,15 +56,7 @@ def generate_batch(num_bits, batch_size):
             i is example idx in batch
             n is always 0
     """
-    x = np.empty((num_bits, batch_size, 2))
-    y = np.empty((num_bits, batch_size, 1))
-
-    for i in range(batch_size):
-        a, b, r = generate_example(num_bits)
-        x[:, i, 0] = a
-        x[:, i, 1] = b
-        y[:, i, 0] = r
-    return x, y
+    return additionBatch(num_bits, batch_size, dtype=dtype)
 
 
 ################################################################################
@@ -93,10 +69,12 @@ OUTPUT_SIZE   = 1       # 1 bit per timestep
 TINY          = 1e-6    # to avoid NaNs in logs
 LEARNING_RATE = 0.01
 
-USE_LSTM = True
+CELL_BACKEND  = "basic_lstm"  # any of rnn_layers.cell_backends, "basic_rnn" for a plain RNN
 
-inputs = tf.placeholder(tf.float32, (None, None, INPUT_SIZE))  # (time, batch, in)
-outputs = tf.placeholder(tf.float32, (None, None, OUTPUT_SIZE)) # (time, batch, out)
+# the placeholders take dtype_policy.feed_dtype arrays, inputs and outputs are them as float32
+policy = DtypePolicy()
+inputs_placeholder, inputs = policy.placeholder((None, None, INPUT_SIZE))  # (time, batch, in)
+outputs_placeholder, outputs = policy.placeholder((None, None, OUTPUT_SIZE)) # (time, batch, out)
 
 
 ## Here cell can be any function you want, provided it has two attributes:
@@ -111,29 +89,23 @@ outputs = tf.placeholder(tf.float32, (None, None, OUTPUT_SIZE)) # (time, batch,
 #                                     but state is memory + hidden
 # Example LSTM cell with learnable zero_state can be found here:
 #    https://gist.github.com/nivwusquorum/160d5cf7e1e82c21fad3ebf04f039317
-if USE_LSTM:
-    cell = tf.nn.rnn_cell.BasicLSTMCell(RNN_HIDDEN, state_is_tuple=True)
-else:
-    cell = tf.nn.rnn_cell.BasicRNNCell(RNN_HIDDEN)
+rnn = StackedRnn(CELL_BACKEND, RNN_HIDDEN, num_layers=1)
 
-# Create initial state. Here it is just a constant tensor filled with zeros,
+# Leaving out the initial state starts from a constant tensor filled with zeros,
 # but in principle it could be a learnable parameter. This is a bit tricky
 # to do for LSTM's tuple state, but can be achieved by creating two vector
 # Variables, which are then tiled along batch dimension and grouped into tuple.
-batch_size    = tf.shape(inputs)[1]
-initial_state = cell.zero_state(batch_size, tf.float32)
 
 # Given inputs (time, batch, input_size) outputs a tuple
 #  - outputs: (time, batch, output_size)  [do not mistake with OUTPUT_SIZE]
 #  - states:  (time, batch, hidden_size)
-rnn_outputs, rnn_states = tf.nn.dynamic_rnn(cell, inputs, initial_state=initial_state, time_major=True)
+rnn_outputs, rnn_states = rnn(inputs, time_major=True)
 
 # project output from rnn output size to OUTPUT_SIZE. Sometimes it is worth adding
 # an extra layer here.
-final_projection = lambda x: layers.linear(x, num_outputs=OUTPUT_SIZE, activation_fn=tf.nn.sigmoid)
-
-# apply projection to every timestep.
-predicted_outputs = map_fn(final_projection, rnn_outputs)
+# applied to every timestep at once with one matmul, map_fn ran one per timestep
+# (benchmark_projection.py compares them)
+predicted_outputs = timeDistributedLinear(rnn_outputs, OUTPUT_SIZE, activation_fn=tf.nn.sigmoid)
 
 # compute elementwise cross entropy.
 error = -(outputs * tf.log(predicted_outputs + TINY) + (1.0 - outputs) * tf.log(1.0 - predicted_outputs + TINY))
@@ -145,36 +117,58 @@ train_fn = tf.train.AdamOptimizer(learning_rate=LEARNING_RATE).minimize(error)
 # assuming that absolute difference between output and correct answer is 0.5
 # or less we can round it to the correct output.
 accuracy = tf.reduce_mean(tf.cast(tf.abs(outputs - predicted_outputs) < 0.5, tf.float32))
+# share of the sums that have every bit right
+number_accuracy = tf.reduce_mean(tf.cast(tf.reduce_all(tf.abs(outputs - predicted_outputs) < 0.5, axis=[0, 2]),
+                                         tf.float32))
 
 
 ################################################################################
 ##                           TRAINING LOOP                                    ##
 ################################################################################
 
-NUM_BITS = 10
+BUCKET_BITS = [10, 16, 24, 32, 48, 64]  # lengths trained on, each up to binary_data.max_bits
+START_BUCKETS = 1  # how many of the shortest buckets are trained on from the start
+UNLOCK_ACCURACY = 0.99  # valid accuracy the longest trained bucket needs to reach before the next one is added
+NUM_EPOCHS = 20
 ITERATIONS_PER_EPOCH = 100
 BATCH_SIZE = 16
+VALID_SIZE = 100
 
-valid_x, valid_y = generate_batch(num_bits=NUM_BITS, batch_size=100)
+sampler = BucketedSampler(BUCKET_BITS, BATCH_SIZE, unlocked=START_BUCKETS, dtype=policy.feed_dtype)
+# every bucket is validated, also the ones not trained on yet, to see how far the addition generalizes
+valid_sets = [generate_batch(num_bits=num_bits, batch_size=VALID_SIZE, dtype=policy.feed_dtype)
+              for num_bits in sampler.bucket_bits]
 
 init_op = tf.global_variables_initializer()
 session = tf.Session()
 session.run(init_op)
 
-for epoch in range(8):
-    epoch_error = 0
+for epoch in range(NUM_EPOCHS):
+    sampler.resetStats()
     for _ in range(ITERATIONS_PER_EPOCH):
         # here train_fn is what triggers backprop. error and accuracy on their
         # own do not trigger the backprop.
-        x, y = generate_batch(num_bits=NUM_BITS, batch_size=BATCH_SIZE)
-        epoch_error += session.run([error, train_fn], {
-            inputs: x,
-            outputs: y,
+        start = time.time()
+        bucket, x, y = sampler.nextBatch()
+        batch_error = session.run([error, train_fn], {
+            inputs_placeholder: x,
+            outputs_placeholder: y,
         })[0]
-    epoch_error /= ITERATIONS_PER_EPOCH
-    valid_accuracy = session.run(accuracy, {
-        inputs:  valid_x,
-        outputs: valid_y,
-    })
-    print("Epoch %d, train error: %.2f, valid accuracy: %.1f %%" % (epoch, epoch_error, valid_accuracy * 100.0))
-
+        sampler.record(bucket, time.time() - start, batch_error)
+
+    print("Epoch %d, training on %d bit numbers and shorter" % (epoch, sampler.bucket_bits[sampler.unlocked - 1]))
+    print("%6s %8s %12s %12s %16s %16s" % ("bits", "batches", "bits/sec", "train error", "valid accuracy",
+                                           "valid numbers"))
+    valid_accuracies = []
+    for bucket, (valid_x, valid_y) in enumerate(valid_sets):
+        valid_accuracy, valid_numbers = session.run([accuracy, number_accuracy], {
+            inputs_placeholder:  valid_x,
+            outputs_placeholder: valid_y,
+        })
+        valid_accuracies.append(valid_accuracy)
+        print("%6d %8d %12.0f %12.2f %15.1f%% %15.1f%%" % (sampler.bucket_bits[bucket], sampler.batches[bucket],
+                                                         sampler.bitsPerSecond(bucket), sampler.meanError(bucket),
+                                                         valid_accuracy * 100.0, valid_numbers * 100.0))
+
+    if valid_accuracies[sampler.unlocked - 1] >= UNLOCK_ACCURACY and sampler.unlockNext():
+        print("Adding %d bit numbers" % sampler.bucket_bits[sampler.unlocked - 1])
@@ -15,24 +15,19 @@
 """
 
 import numpy as np
-import random
 import tensorflow as tf
 import tensorflow.contrib.layers as layers
-
-def generate_example(num_bits):
-    return random.getrandbits(num_bits)
+from dtype_policy import float_dtype
+from binary_data import randomNumbers
 
 
 def generate_batch(num_bits, batch_num):
-    ins = np.empty((num_bits, batch_num, 1))
-    outs = np.empty((num_bits, batch_num, 1))
-
-    outs[0]
-    for i in range(batch_num):
-        a = generate_example(num_bits)
-        ins[:, i, 0] = a
-        if i+1 < batch_num:
-            outs[:, i+1, 0] = a
+    # every example is one random number repeated over all the time steps, the answer is the previous example's
+    numbers = randomNumbers(num_bits, batch_num).astype(float_dtype)
+    ins = np.empty((num_bits, batch_num, 1), dtype=float_dtype)
+    outs = np.zeros((num_bits, batch_num, 1), dtype=float_dtype)
+    ins[:, :, 0] = numbers
+    outs[:, 1:, 0] = numbers[:-1]
     return ins, outs
 
 
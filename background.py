@@ -0,0 +1,86 @@
+from __future__ import print_function, division
+import threading
+import traceback
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+# work that shouldn't hold up the training loop, like writing samples, runs on a worker thread
+# submit never blocks: if the worker falls behind, the oldest request that hasn't started yet is dropped, since a
+# newer request (a later epoch) makes it stale anyway. so only give it work that is fine to skip, never the saves
+
+
+class BackgroundWorker(object):
+    def __init__(self, job, max_pending=1):
+        # job is called as job(*args) for every submit(*args) that doesn't get dropped
+        # max_pending is how many requests can wait while the worker is busy before the oldest ones get dropped
+        self.job = job
+        self.requests = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True  # don't keep the process alive if training ends without close()
+        self.thread.start()
+
+    def submit(self, *args):
+        while True:
+            try:
+                self.requests.put_nowait(args)
+                return
+            except queue.Full:
+                try:
+                    stale = self.requests.get_nowait()
+                    self.requests.task_done()
+                    print("Worker is behind, dropping", stale)
+                except queue.Empty:
+                    pass  # the worker just took it, so there is room now
+
+    def run(self):
+        while True:
+            args = self.requests.get()
+            try:
+                if args is None:  # close() was called
+                    return
+                self.job(*args)
+            except Exception:
+                traceback.print_exc()  # keep the worker alive for the next request
+            finally:
+                self.requests.task_done()
+
+    def close(self):
+        # waits for whatever is already queued to finish, then stops the thread
+        self.requests.put(None)
+        self.thread.join()
+
+
+class BatchPrefetcher(object):
+    def __init__(self, produce, depth=2):
+        # calls produce() over and over on a worker thread and keeps up to depth results ready, so building the next
+        # batch (or epoch) of data happens while sess.run is busy instead of between runs
+        self.produce = produce
+        self.ready = queue.Queue(maxsize=depth)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True  # the thread is always waiting to put the next result, don't wait for it on exit
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.ready.put((self.produce(), None))
+            except Exception as error:
+                self.ready.put((None, error))  # hand it to whoever is waiting for the result
+                return
+
+    def get(self):
+        result, error = self.ready.get()
+        if error is not None:
+            raise error
+        return result
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.get()
+
+    next = __next__  # python 2
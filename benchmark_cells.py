@@ -0,0 +1,89 @@
+from __future__ import print_function, division
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+# compares the cell backends from rnn_layers.py on the predict_2 sized model (state_size 512, num_layers 2)
+# every backend runs in its own process, so its peak memory doesn't include the ones that ran before it
+#   python benchmark_cells.py          runs every backend and prints a table
+#   python benchmark_cells.py fused    runs a single backend
+
+state_size = 512
+num_layers = 2
+batch_size = 64
+bpl = 50
+classes = 34
+warmup_steps = 5  # the first runs include graph optimization and allocation, so they aren't timed
+timed_steps = 50
+
+
+def benchmark(backend):
+    import tensorflow as tf
+    from rnn_layers import StackedRnn
+
+    batchX_placeholder = tf.placeholder(dtype=tf.uint8, shape=[None, None])
+    batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None])
+    init_state = tf.placeholder(tf.float32, [num_layers, 2, None, state_size])
+    layers = tf.unstack(init_state, axis=0)
+    rnn_tuple_state = tuple(
+             [tf.nn.rnn_cell.LSTMStateTuple(layers[idx][0], layers[idx][1])
+              for idx in range(num_layers)]
+    )
+
+    output_weight = tf.Variable(np.random.rand(state_size, classes), dtype=tf.float32)
+    output_bias = tf.Variable(np.zeros(shape=(1, classes)), dtype=tf.float32)
+
+    rnn = StackedRnn(backend, state_size, num_layers)
+    states_series, current_state = rnn(tf.one_hot(batchX_placeholder, classes), initial_state=rnn_tuple_state)
+
+    logits = tf.matmul(tf.reshape(states_series, [-1, state_size]), output_weight) + output_bias
+    losses = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=logits, labels=tf.reshape(batchY_placeholder, [-1]))
+    total_loss = tf.reduce_mean(input_tensor=losses)
+    train_step = tf.train.AdagradOptimizer(learning_rate=0.2).minimize(total_loss)
+
+    batchX = np.random.randint(0, classes, size=(batch_size, bpl)).astype(np.uint8)
+    batchY = np.random.randint(0, classes, size=(batch_size, bpl)).astype(np.int32)
+
+    with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        _current_state = np.zeros((num_layers, 2, batch_size, state_size), dtype=np.float32)
+
+        for step in range(warmup_steps + timed_steps):
+            if step == warmup_steps:
+                start = time.time()
+            _total_loss, _train_step, _current_state = sess.run(
+                [total_loss, train_step, current_state],
+                feed_dict={
+                    batchX_placeholder: batchX,
+                    batchY_placeholder: batchY,
+                    init_state: _current_state
+                })
+
+        steps_per_sec = timed_steps / (time.time() - start)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in kilobytes on linux
+    print("RESULT", backend, steps_per_sec, peak_mb)
+
+
+def main():
+    if len(sys.argv) > 1:
+        benchmark(sys.argv[1])
+        return
+
+    from rnn_layers import cell_backends
+
+    print("batch_size", batch_size, "bpl", bpl, "state_size", state_size, "num_layers", num_layers)
+    print("{:<12}{:>12}{:>14}{:>16}".format("backend", "steps/sec", "chars/sec", "peak memory MB"))
+    for backend in cell_backends:
+        output = subprocess.check_output([sys.executable, __file__, backend]).decode("utf-8")
+        result = [line.split() for line in output.splitlines() if line.startswith("RESULT")][0]
+        steps_per_sec = float(result[2])
+        peak_mb = float(result[3])
+        print("{:<12}{:>12.2f}{:>14.0f}{:>16.0f}".format(backend, steps_per_sec, steps_per_sec * batch_size * bpl,
+                                                        peak_mb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from __future__ import print_function, division
+import time
+import numpy as np
+
+# compares the two ways of putting add_0's output layer on every time step, on add_0's model at growing NUM_BITS
+# "map_fn": tf.map_fn over the time steps, a while loop running one small matmul per step (what add_0 used to do)
+# "fused": rnn_layers.timeDistributedLinear, one reshape, matmul and reshape for all of them
+# the rnn itself is the same in both, so the difference is only the projection
+#   python benchmark_projection.py
+
+num_bits_list = [10, 32, 64, 128, 256]
+projections = ["map_fn", "fused"]
+rnn_hidden = 20
+cell_backend = "basic_lstm"
+batch_size = 16
+warmup_steps = 5  # the first runs include graph optimization and allocation, so they aren't timed
+timed_steps = 50
+
+
+def benchmark(projection, num_bits):
+    # returns training steps per second
+    import tensorflow as tf
+    import tensorflow.contrib.layers as layers
+    from rnn_layers import StackedRnn, timeDistributedLinear
+
+    with tf.Graph().as_default():
+        inputs = tf.placeholder(tf.float32, (None, None, 2))  # (time, batch, in)
+        outputs = tf.placeholder(tf.float32, (None, None, 1))  # (time, batch, out)
+
+        rnn = StackedRnn(cell_backend, rnn_hidden, num_layers=1)
+        rnn_outputs, rnn_states = rnn(inputs, time_major=True)
+
+        if projection == "map_fn":
+            final_projection = lambda x: layers.linear(x, num_outputs=1, activation_fn=tf.nn.sigmoid)
+            predicted_outputs = tf.map_fn(final_projection, rnn_outputs)
+        else:
+            predicted_outputs = timeDistributedLinear(rnn_outputs, 1, activation_fn=tf.nn.sigmoid)
+
+        error = -(outputs * tf.log(predicted_outputs + 1e-6) + (1.0 - outputs) * tf.log(1.0 - predicted_outputs + 1e-6))
+        error = tf.reduce_mean(error)
+        train_fn = tf.train.AdamOptimizer(learning_rate=0.01).minimize(error)
+
+        # random bits are enough for timing, and unlike binary_data they aren't limited to 64
+        x = np.random.randint(0, 2, size=(num_bits, batch_size, 2)).astype(np.float32)
+        y = np.random.randint(0, 2, size=(num_bits, batch_size, 1)).astype(np.float32)
+
+        with tf.Session() as session:
+            session.run(tf.global_variables_initializer())
+            for step in range(warmup_steps + timed_steps):
+                if step == warmup_steps:
+                    start = time.time()
+                session.run([error, train_fn], {inputs: x, outputs: y})
+            return timed_steps / (time.time() - start)
+
+
+def main():
+    print("batch_size", batch_size, "rnn_hidden", rnn_hidden, "cell", cell_backend)
+    header = "".join("{:>16}".format(projection + " steps/s") for projection in projections)
+    print("{:<10}".format("NUM_BITS") + header + "{:>10}".format("speedup"))
+    for num_bits in num_bits_list:
+        steps_per_sec = [benchmark(projection, num_bits) for projection in projections]
+        print("{:<10}".format(num_bits) + "".join("{:>16.1f}".format(speed) for speed in steps_per_sec) +
+              "{:>10.2f}".format(steps_per_sec[1] / steps_per_sec[0]))
+
+
+if __name__ == "__main__":
+    main()
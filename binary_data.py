@@ -0,0 +1,142 @@
+from __future__ import print_function, division
+import numpy as np
+from dtype_policy import float_dtype
+from char_codec import indicesToOneHot
+
+# builds the data for the binary tasks (add_0, add_1, count_0) with numpy for the whole batch at once
+# the numbers are drawn as uint64 arrays and cut into bits with np.unpackbits, so num_bits can go up to 64 and a batch
+# of tens of thousands is made in a fraction of a second, instead of a python loop per example and per bit
+# the bits come out time major and least significant bit first (timestep t is bit t), so an RNN can carry like a
+# person adding on paper
+
+max_bits = 64
+
+
+def randomNumbers(num_bits, size, rng=None):
+    # uint64 array of numbers below 2 ** num_bits
+    # rng is anything with randint, pass np.random.RandomState(seed) to get the same data every run
+    if not 0 <= num_bits <= max_bits:
+        raise ValueError("num_bits has to be between 0 and " + str(max_bits) + ", got " + str(num_bits))
+    if rng is None:
+        rng = np.random
+    if num_bits == 0:
+        return np.zeros(size, dtype=np.uint64)
+    # randint can't take 2 ** 64 as high, so the top bit is drawn on its own
+    numbers = rng.randint(0, 2 ** (num_bits - 1), size=size, dtype=np.uint64)
+    top_bits = rng.randint(0, 2, size=size, dtype=np.uint64)
+    return numbers | (top_bits << np.uint64(num_bits - 1))
+
+
+def toBits(numbers, num_bits, dtype=float_dtype):
+    # numbers: uint64 array [batch_size]
+    # returns [num_bits, batch_size], row t is bit t of every number
+    # the little endian bytes of every number, unpackbits gives the bits of a byte highest first so they're reversed
+    number_bytes = np.asarray(numbers, dtype="<u8").view(np.uint8).reshape((-1, 8))
+    bits = np.unpackbits(number_bytes, axis=1).reshape((-1, 8, 8))[:, :, ::-1].reshape((-1, max_bits))
+    return bits[:, :num_bits].T.astype(dtype)
+
+
+def additionBatch(num_bits, batch_size, rng=None, dtype=float_dtype):
+    # both summands have num_bits - 1 random bits, so their sum always fits in num_bits
+    # returns (x [num_bits, batch_size, 2]: the two summands,
+    #          y [num_bits, batch_size, 1]: their sum)
+    a = randomNumbers(num_bits - 1, batch_size, rng)
+    b = randomNumbers(num_bits - 1, batch_size, rng)
+    x = np.empty((num_bits, batch_size, 2), dtype=dtype)
+    x[:, :, 0] = toBits(a, num_bits, dtype)
+    x[:, :, 1] = toBits(b, num_bits, dtype)
+    y = toBits(a + b, num_bits, dtype)[:, :, np.newaxis]
+    return x, y
+
+
+class BucketedSampler(object):
+    # draws the training batches from several bit lengths (buckets), every batch is a single length so nothing is
+    # padded and a short batch costs only its own time steps. only the shortest unlocked buckets are drawn from, the
+    # training loop unlocks the next longer one when it's doing well enough (a curriculum)
+    # it also keeps the training throughput and error of every bucket, see record()
+    def __init__(self, bucket_bits, batch_size, unlocked=1, rng=None, dtype=float_dtype):
+        self.bucket_bits = sorted(bucket_bits)
+        if self.bucket_bits[-1] > max_bits:
+            raise ValueError("Buckets can be at most " + str(max_bits) + " bits, got " + str(self.bucket_bits[-1]))
+        self.batch_size = batch_size
+        self.unlocked = min(unlocked, len(self.bucket_bits))
+        self.rng = np.random if rng is None else rng
+        self.dtype = dtype
+        self.resetStats()
+
+    def nextBatch(self):
+        # returns (bucket index, x, y), the bucket is picked uniformly from the unlocked ones
+        bucket = self.rng.randint(0, self.unlocked)
+        x, y = additionBatch(self.bucket_bits[bucket], self.batch_size, self.rng, self.dtype)
+        return bucket, x, y
+
+    def unlockNext(self):
+        # returns False when every bucket is already unlocked
+        if self.unlocked == len(self.bucket_bits):
+            return False
+        self.unlocked += 1
+        return True
+
+    def record(self, bucket, seconds, error):
+        # seconds: how long making and training on the batch took, error: its training error
+        self.batches[bucket] += 1
+        self.seconds[bucket] += seconds
+        self.error_total[bucket] += error
+
+    def resetStats(self):
+        self.batches = np.zeros(len(self.bucket_bits), dtype=np.int64)
+        self.seconds = np.zeros(len(self.bucket_bits))
+        self.error_total = np.zeros(len(self.bucket_bits))
+
+    def bitsPerSecond(self, bucket):
+        # answer bits trained on per second, comparable between buckets of different lengths
+        if self.seconds[bucket] == 0:
+            return 0.0
+        return self.batches[bucket] * self.batch_size * self.bucket_bits[bucket] / self.seconds[bucket]
+
+    def meanError(self, bucket):
+        if self.batches[bucket] == 0:
+            return 0.0
+        return self.error_total[bucket] / self.batches[bucket]
+
+
+class BitStringDataset(object):
+    # every num_bits long binary string, with how many 1s it has as its label (count_0)
+    # nothing is made up front: index i stands for the number permutation(i), and a batch of indices is turned into
+    # bits and labels only when it's asked for, so memory is the size of a batch and num_bits can go up to 64
+    # the permutation is a seeded bijection of [0, 2 ** num_bits), so taking the indices [0, n) as the training set and
+    # the ones after it as the test set is a shuffled split with no number in both
+    def __init__(self, num_bits, seed=None):
+        if not 1 <= num_bits <= max_bits:
+            raise ValueError("num_bits has to be between 1 and " + str(max_bits) + ", got " + str(num_bits))
+        self.num_bits = num_bits
+        self.size = 2 ** num_bits
+        self.num_classes = num_bits + 1  # 0 to num_bits ones
+        self.mask = np.uint64(self.size - 1)
+
+        # an odd multiplier makes x * a + b a bijection mod 2 ** num_bits, but on its own its low bits follow the index
+        # (the lowest one just alternates), so it's done twice with the high bits xored down into the low ones after
+        # each, which is a bijection too
+        rng = np.random.RandomState(seed)
+        self.multipliers = [np.uint64(randomNumbers(num_bits, 1, rng)[0] | 1) for _ in range(2)]
+        self.offsets = [np.uint64(randomNumbers(num_bits, 1, rng)[0]) for _ in range(2)]
+        self.shift = np.uint64(max(1, num_bits // 2))
+
+    def numbers(self, indices):
+        # uint64 array of the numbers the indices stand for
+        x = np.asarray(indices, dtype=np.uint64)
+        with np.errstate(over="ignore"):  # the uint64 products wrap, which is the mod 2 ** 64 the mask relies on
+            for i in range(2):
+                x = (x * self.multipliers[i] + self.offsets[i]) & self.mask
+                x ^= x >> self.shift
+        return x
+
+    def inputsOf(self, numbers, dtype=float_dtype):
+        # [len(numbers), num_bits, 1], most significant bit first, like '{0:020b}'.format(number)
+        return toBits(np.asarray(numbers, dtype=np.uint64), self.num_bits, dtype)[::-1].T[:, :, np.newaxis]
+
+    def batch(self, indices, dtype=float_dtype):
+        # returns (inputs [len(indices), num_bits, 1], one hot counts of ones [len(indices), num_bits + 1])
+        inputs = self.inputsOf(self.numbers(indices), dtype)
+        counts = np.sum(inputs[:, :, 0], axis=1).astype(np.int64)
+        return inputs, indicesToOneHot(counts, self.num_classes, dtype)
@@ -0,0 +1,82 @@
+from __future__ import print_function, division
+import hashlib
+import numpy as np
+
+# shared character <-> class conversion for the predict_* scripts
+# every byte value gets a row in a 256 entry lookup table, so a whole string is encoded with one fancy index
+# instead of walking an if/elif chain per character
+
+base = 26  # how many characters
+extras = 8  # how many extra characters
+num_classes = base + extras  # defines the one hot vector length
+extra_chars = ". '\",?!:"  # extra_chars[i] is class base+i
+unknown_class = base + 4  # anything we don't know about becomes a comma
+unknown_char = "&"  # what a class outside of the map decodes to
+
+codec_version = 1  # bump this if the way text is turned into classes changes
+
+# char code -> class index
+encode_table = np.full(256, unknown_class, dtype=np.uint8)
+encode_table[ord('a'):ord('z') + 1] = np.arange(base)
+for i in range(extras):
+    encode_table[ord(extra_chars[i])] = base + i
+
+# class index -> char, any index we don't have a char for decodes to unknown_char
+decode_table = np.full(256, ord(unknown_char), dtype=np.uint8)
+decode_table[:base] = np.arange(ord('a'), ord('z') + 1)
+for i in range(extras):
+    decode_table[base + i] = ord(extra_chars[i])
+
+
+def codecSignature():
+    # changes whenever the version or either table changes, so anything cached from an old map can be thrown out
+    digest = hashlib.sha1(str(codec_version).encode("ascii"))
+    digest.update(encode_table.tobytes())
+    digest.update(decode_table.tobytes())
+    return digest.hexdigest()
+
+
+def stringToIndices(string):
+    # returns a uint8 array with one class index per character
+    codes = np.frombuffer(string.encode("utf-32-le"), dtype=np.uint32)
+    codes = np.minimum(codes, 255)  # 255 isn't in the map, so anything outside of latin-1 is unknown too
+    return encode_table[codes]
+
+
+def indicesToString(indices):
+    # turns any int array of class indices back into a string
+    indices = np.asarray(indices).ravel()
+    indices = np.where((indices < 0) | (indices > 255), 255, indices).astype(np.uint8)  # decodes to unknown_char
+    return decode_table[indices].tobytes().decode("latin-1")
+
+
+identities = {}  # (classes, dtype) -> identity matrix, so expanding a batch doesn't rebuild np.eye every time
+
+
+def indicesToOneHot(indices, classes=num_classes, dtype=np.float32):
+    # only expand to one hot when something actually needs it, output has shape indices.shape + [classes]
+    key = (classes, np.dtype(dtype))
+    if key not in identities:
+        identities[key] = np.eye(classes, dtype=dtype)
+    return identities[key][indices]
+
+
+def oneHotToIndices(classList):
+    return np.argmax(classList, axis=-1)
+
+
+def stringToClassList(string, classes=num_classes):
+    # one hot array of shape [len(string), classes]
+    return indicesToOneHot(stringToIndices(string), classes)
+
+
+def classListToString(classList):
+    return indicesToString(oneHotToIndices(classList))
+
+
+def charToClass(char, classes=num_classes):
+    return stringToClassList(char, classes)[0]
+
+
+def classToChar(arry):
+    return classListToString(np.asarray(arry)[np.newaxis])
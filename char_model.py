@@ -0,0 +1,281 @@
+from __future__ import print_function, division
+import numpy as np
+import tensorflow as tf
+import os.path
+from functools import partial
+from corpus_cache import loadCorpus
+from text_streams import StreamBatcher
+from generation import buildGenerator
+from rnn_layers import StackedRnn, ResidentState
+from background import BackgroundWorker, BatchPrefetcher
+from char_codec import num_classes, indicesToString
+from dtype_policy import floatVariable, zeros
+
+# the char level LSTM the predict_2 scripts train, and the loop that trains it, saves it and writes samples
+# the scripts only pick the settings. the variables are made in the order the scripts always made them, with no scope
+# around them, so the brains they saved still restore
+
+
+def brainPath(script_file, name_list):
+    # ./brain/<script name>/model_<name_list joined by _>.ckpt, the samples get written next to it
+    brain_path = "./brain/" + os.path.basename(script_file)[:-3] + "/model"
+    for i in range(len(name_list)):
+        brain_path += "_" + name_list[i]
+    return brain_path + ".ckpt"
+
+
+class CharModel(object):
+    def __init__(self, cell_backend, num_layers, state_size, input_classes, output_classes, learning_rate,
+                 temperature, batch_size, stateful=False, keep_prob=1.0, layer_names=None):
+        # temperature: what the predictions are softened by and what the samples are spread around
+        # batch_size: how many streams every training batch has, only the stateful state needs it to be fixed
+        self.cell_backend = cell_backend
+        self.num_layers = num_layers
+        self.state_size = state_size
+        self.input_classes = input_classes
+        self.output_classes = output_classes
+        self.learning_rate = learning_rate
+        self.temperature = temperature
+        self.batch_size = batch_size
+        self.stateful = stateful
+        self.layer_names = layer_names
+
+        # input and output class indices [batch_size, bpl], the inputs are only expanded to one hot inside the graph
+        # keeping the values as None lets it be dynamic so we can do 1 char at a time later!
+        self.batchX_placeholder = tf.placeholder(dtype=tf.uint8, shape=[None, None])
+        self.batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None])
+        inputs = tf.one_hot(self.batchX_placeholder, input_classes)  # [batch_size, bpl, input_classes]
+
+        rnn = StackedRnn(cell_backend, state_size, num_layers, keep_prob=keep_prob, layer_names=layer_names)
+        if stateful:
+            # the state lives in the graph between runs, see rnn_layers.ResidentState
+            self.resident_state = ResidentState(rnn.zero_state(batch_size, tf.float32))
+            rnn_tuple_state = self.resident_state.state
+        else:
+            # tuple size is 2
+            self.init_state = tf.placeholder(tf.float32, [num_layers, 2, None, state_size])
+            layers = tf.unstack(self.init_state, axis=0)
+            rnn_tuple_state = tuple(
+                     [tf.nn.rnn_cell.LSTMStateTuple(layers[idx][0], layers[idx][1])
+                      for idx in range(num_layers)]
+            )
+
+        # these are necessary, otherwise you have no way of converting state to
+        self.output_weight = floatVariable(np.random.rand(state_size, output_classes))
+        self.output_bias = floatVariable(np.zeros(shape=(1, output_classes)))
+
+        states_series, self.current_state = rnn(inputs, initial_state=rnn_tuple_state, time_major=False)
+
+        states_series = tf.reshape(states_series, [-1, state_size])
+        logits = tf.matmul(states_series, self.output_weight) + self.output_bias  # logits = 150, 50
+        labels = tf.reshape(self.batchY_placeholder, [-1])  # lines up with the logits rows
+
+        self.predictions_series = tf.nn.softmax(tf.scalar_mul(scalar=float(1)/float(temperature), x=logits))
+
+        losses = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=logits, labels=labels)
+        self.total_loss = tf.reduce_mean(input_tensor=losses)
+        self.train_step = tf.train.AdagradOptimizer(learning_rate=learning_rate).minimize(self.total_loss)
+        if stateful:
+            # keeps the state for the next window
+            self.train_step = self.resident_state.update(self.current_state, after=[self.train_step])
+
+        # generates the samples inside the graph, see writeSamples
+        self.gen_prompts, self.gen_temperatures, self.gen_num_chars, self.generated = buildGenerator(
+            rnn.cell, self.output_weight, self.output_bias, input_classes, temperature)
+
+        # the weights, in the order they were made. a copy of the model makes its own in the same order
+        self.variables = tf.trainable_variables()
+
+    def samplingCopy(self):
+        # the same model without dropout or a resident state, built into the current default graph
+        return CharModel(self.cell_backend, self.num_layers, self.state_size, self.input_classes, self.output_classes,
+                         self.learning_rate, self.temperature, self.batch_size, layer_names=self.layer_names)
+
+    def snapshot(self, sess):
+        # the values of all the weights from a single run, so they all come from the same training step
+        return sess.run(self.variables)
+
+    def zeroState(self, batch):
+        # tuple size is 2
+        return zeros((self.num_layers, 2, batch, self.state_size))
+
+    def resetState(self, sess):
+        # stateful only: zeroes the resident state, at epoch boundaries
+        sess.run(self.resident_state.reset)
+
+    def train(self, sess, batchX, batchY, state=None):
+        # one training step, returns (loss, state after the batch, predictions [batch * bpl, output_classes])
+        # stateful: state is left out and comes back as None
+        feed_dict = {
+            self.batchX_placeholder: batchX,  # input for this batch
+            self.batchY_placeholder: batchY,  # output (answers) for this batch
+        }
+        if self.stateful:
+            _total_loss, _train_step, _predictions_series = sess.run(
+                [self.total_loss, self.train_step, self.predictions_series], feed_dict=feed_dict)
+            return _total_loss, None, _predictions_series
+
+        feed_dict[self.init_state] = state
+        _total_loss, _train_step, _current_state, _predictions_series = sess.run(
+            [self.total_loss, self.train_step, self.current_state, self.predictions_series], feed_dict=feed_dict)
+        return _total_loss, _current_state, _predictions_series
+
+
+def charBatches(streams):
+    # hands out the windows of every epoch in order, one [batch_size, bpl] batch at a time
+    # each epoch starts at a random offset so the text isn't always cut into windows at the same places
+    while True:
+        for x, y in streams.windows(streams.randomOffset()):
+            # class indices of size [batch_size, bpl]
+            batchX = np.array(x)  # copies out of the memory map here rather than when it gets fed
+            batchY = y.astype(np.int32)
+
+            yield batchX, batchY
+
+
+def writeSamples(sess, model, epoch, save_path, temperature_spread, verbose=True):
+    gen_batch_size = 16  # how many independent samples to write, they all share one batched run
+    gen_num_batches = 2000
+
+    # every stream starts the sequence from its own random class and has its own temperature, spread evenly around
+    # temperature so one checkpoint shows how the samples change from more careful to more random
+    prompts = np.random.randint(0, num_classes, size=(gen_batch_size, 1))
+    temperatures = np.linspace(model.temperature * (1 - temperature_spread),
+                               model.temperature * (1 + temperature_spread), gen_batch_size).astype(np.float32)
+
+    _generated = sess.run(model.generated, feed_dict={
+        model.gen_prompts: prompts,
+        model.gen_temperatures: temperatures,
+        model.gen_num_chars: gen_num_batches
+    })
+
+    if verbose:
+        print("Prediction:")
+    for stream in range(gen_batch_size):
+        chars = indicesToString(_generated[stream])
+
+        text_file_name = "output" + str(epoch) + "_" + str(stream) + "_t{:.2f}".format(temperatures[stream]) + ".txt"
+        text_file = open(save_path + text_file_name, "w")
+        text_file.write(chars)
+        text_file.close()
+    if verbose:
+        print(indicesToString(_generated[0, :150]))
+
+
+class SampleWriter(object):
+    # writes the samples for snapshots of a model's weights from a graph and session of its own, so it can run on
+    # another thread while training carries on changing the weights of the model
+    def __init__(self, model, save_path, temperature_spread, verbose=True):
+        self.save_path = save_path
+        self.temperature_spread = temperature_spread
+        self.verbose = verbose
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.model = model.samplingCopy()
+            self.sess = tf.Session(graph=self.graph)
+            self.sess.run(tf.global_variables_initializer())
+        for variable, original in zip(self.model.variables, model.variables):
+            if variable.shape != original.shape:
+                raise ValueError("The sampling copy made " + variable.name + " " + str(variable.shape) + " where " +
+                                 original.name + " is " + str(original.shape))
+
+    def write(self, epoch, snapshot):
+        # snapshot: the weights from model.snapshot
+        for variable, value in zip(self.model.variables, snapshot):
+            variable.load(value, self.sess)
+        writeSamples(self.sess, self.model, epoch, self.save_path, self.temperature_spread, self.verbose)
+
+    def close(self):
+        self.sess.close()
+
+
+def decode(coded):
+    vals = np.zeros(len(coded))
+    for i in range(len(coded)):
+        vals[i] = (np.argmax(coded[i]))
+
+    return vals
+
+
+def printPrediction(batchX, batchY, predictions, batch_series_i=2):
+    # predictions: [bpl, output_classes] for the stream batch_series_i of the batch
+    print("Input:")
+    print("[", end="")
+    print(*batchX[batch_series_i, :], sep=" ", end="")
+    print("]")
+    print("Output:")
+    print("[", end="")
+    print(*batchY[batch_series_i, :], sep=" ", end="")
+    print("]")
+    print("Prediction:")
+    print("[", end="")
+    print(*decode(predictions), sep=" ", end="")
+    print("]")
+
+
+def trainChars(model, corpus_path, brain_path, num_epochs, bpl, shift=1, prefetch_depth=4, temperature_spread=0.5,
+               verbose=True, log_device_placement=False):
+    # trains model on the corpus one epoch (one pass over the corpus) at a time, restoring brain_path first if it's
+    # there. after every epoch it saves to brain_path and writes samples next to it
+    # shift: how far ahead of the inputs the answers are, 1 means predict the next character
+    # verbose: print the loss and a prediction as it goes instead of only the saves
+    save_path = os.path.dirname(brain_path) + "/"
+
+    # one uint8 class index per character, expanded to one hot in the graph. cached and memory mapped after the first
+    # run
+    dataIndices = loadCorpus(corpus_path)
+    # every row of a batch reads its own contiguous part of the corpus, one epoch is one pass over all of it
+    streams = StreamBatcher(dataIndices, model.batch_size, bpl, shift=shift)
+    batches_per_epoch = streams.num_windows  # how many batches to do before starting a new epoch
+
+    saver = tf.train.Saver()
+
+    # the saves happen in the training loop, between steps, so every checkpoint is the weights of one step and none
+    # get skipped. only the sampling is left to a worker thread, on a snapshot taken at the same point
+    sample_writer = SampleWriter(model, save_path, temperature_spread, verbose)
+    sampler = BackgroundWorker(sample_writer.write)
+
+    # builds the next batches on another thread while the current one trains
+    batches = BatchPrefetcher(partial(next, charBatches(streams)), depth=prefetch_depth)
+
+    np.set_printoptions(precision=1)
+    with tf.Session(config=tf.ConfigProto(log_device_placement=log_device_placement)) as sess:
+        sess.run(tf.global_variables_initializer())
+        sess.run(tf.local_variables_initializer())
+
+        if os.path.isfile(brain_path + ".index"):
+            print("Restoring Model")
+            saver.restore(sess, brain_path)
+        else:
+            print("No Model Found")
+
+        for epoch in range(num_epochs):
+            # the state is only reset here and carried from window to window inside the epoch
+            if model.stateful:
+                model.resetState(sess)
+            _current_state = None if model.stateful else model.zeroState(model.batch_size)
+
+            if verbose:
+                print("New data, epoch:", epoch)
+
+            for batch_i in range(batches_per_epoch):
+                batchX, batchY = batches.get()  # already built while the last step was running
+
+                _total_loss, _current_state, _predictions_series = model.train(sess, batchX, batchY, _current_state)
+
+                if verbose and batch_i % 10 == 0:
+                    print("Step:", batch_i, "Loss:", _total_loss)
+
+                if verbose and batch_i % 400 == 0:
+                    batch_series_i = 2
+                    _predictions_series = np.reshape(a=_predictions_series,
+                                                     newshape=[model.batch_size, bpl, model.output_classes])
+                    printPrediction(batchX, batchY, _predictions_series[batch_series_i, :], batch_series_i)
+
+            print("Epoch Done. Save model and write to " + save_path + str(epoch))
+            saver.save(sess, brain_path)
+            sampler.submit(epoch, model.snapshot(sess))  # samples without holding up training
+
+        sampler.close()  # let the last samples finish
+        sample_writer.close()
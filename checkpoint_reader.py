@@ -0,0 +1,211 @@
+from __future__ import print_function, division
+import os
+import struct
+import numpy as np
+
+# reads the variables saved by tf.train.Saver (V2 checkpoints) without tensorflow
+# a checkpoint prefix like brain/predict_2/model_layers_2_state_512.ckpt is made of
+#   prefix.index: a leveldb style table mapping every variable name to where its bytes are (a BundleEntryProto)
+#   prefix.data-00000-of-00001: the raw little endian bytes of all the variables, one after the other
+# only the parts of the formats tf.train.Saver actually writes are handled: no compression and no partitioned variables
+
+table_magic = 0xdb4775248b80fb57
+footer_size = 48  # two block handles padded to 40 bytes, then the 8 byte magic number
+block_trailer_size = 5  # compression type byte and crc32 after every block
+
+# tensorflow DataType enum values to numpy dtypes
+dtypes = {
+    1: np.float32,
+    2: np.float64,
+    3: np.int32,
+    4: np.uint8,
+    5: np.int16,
+    6: np.int8,
+    9: np.int64,
+    10: np.bool_,
+    17: np.uint16,
+    19: np.float16,
+}
+
+
+def readVarint(data, pos):
+    # returns (value, position after it)
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def readFields(data):
+    # splits a serialized protobuf message into a list of (field number, value)
+    # varints come back as ints, length delimited fields as bytes (sub messages are parsed by the caller)
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = readVarint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = readVarint(data, pos)
+        elif wire_type == 1:
+            value = struct.unpack_from("<Q", data, pos)[0]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = readVarint(data, pos)
+            value = bytes(data[pos:pos + length])
+            pos += length
+        elif wire_type == 5:
+            value = struct.unpack_from("<I", data, pos)[0]
+            pos += 4
+        else:
+            raise ValueError("Unsupported protobuf wire type " + str(wire_type))
+        fields.append((field, value))
+    return fields
+
+
+def parseShape(data):
+    # TensorShapeProto: repeated Dim dim = 2, Dim has int64 size = 1
+    shape = []
+    for field, value in readFields(data):
+        if field == 2:
+            size = 0
+            for dim_field, dim_value in readFields(value):
+                if dim_field == 1:
+                    size = dim_value
+            shape.append(size)
+    return tuple(shape)
+
+
+class TensorEntry(object):
+    # BundleEntryProto: dtype = 1, shape = 2, shard_id = 3, offset = 4, size = 5, crc32c = 6, slices = 7
+    def __init__(self, data):
+        self.dtype = 1
+        self.shape = ()
+        self.shard_id = 0
+        self.offset = 0
+        self.size = 0
+        self.sliced = False
+        for field, value in readFields(data):
+            if field == 1:
+                self.dtype = value
+            elif field == 2:
+                self.shape = parseShape(value)
+            elif field == 3:
+                self.shard_id = value
+            elif field == 4:
+                self.offset = value
+            elif field == 5:
+                self.size = value
+            elif field == 7:
+                self.sliced = True
+
+
+class CheckpointReader(object):
+    def __init__(self, prefix):
+        # prefix is what was passed to saver.save / saver.restore, without .index
+        self.prefix = prefix
+        with open(prefix + ".index", "rb") as index_file:
+            table = index_file.read()
+
+        self.entries = {}
+        self.num_shards = 1
+        self.big_endian = False
+        for key, value in readTable(table):
+            if key == b"":  # BundleHeaderProto: num_shards = 1, endianness = 2
+                for field, field_value in readFields(value):
+                    if field == 1:
+                        self.num_shards = field_value
+                    elif field == 2:
+                        self.big_endian = field_value == 1
+            else:
+                self.entries[key.decode("utf-8")] = TensorEntry(value)
+
+    def names(self):
+        return sorted(self.entries.keys())
+
+    def shape(self, name):
+        return self.entries[name].shape
+
+    def dataPath(self, shard_id):
+        return "{}.data-{:05d}-of-{:05d}".format(self.prefix, shard_id, self.num_shards)
+
+    def tensor(self, name):
+        entry = self.entries[name]
+        if entry.sliced:
+            raise ValueError(name + " was saved as partitioned slices, which aren't supported")
+        if entry.dtype not in dtypes:
+            raise ValueError(name + " has tensorflow dtype " + str(entry.dtype) + ", which isn't supported")
+
+        dtype = np.dtype(dtypes[entry.dtype]).newbyteorder(">" if self.big_endian else "<")
+        with open(self.dataPath(entry.shard_id), "rb") as data_file:
+            data_file.seek(entry.offset)
+            data = data_file.read(entry.size)
+        if len(data) != entry.size:
+            raise IOError(self.dataPath(entry.shard_id) + " is too short for " + name)
+
+        # the copy makes it writable and native byte order
+        return np.frombuffer(data, dtype=dtype).reshape(entry.shape).astype(dtypes[entry.dtype])
+
+    def tensors(self, skip_slots=True):
+        # returns {name: array} for every variable, leaving out the optimizer slots (like Variable/Adagrad) by default
+        return dict((name, self.tensor(name)) for name in self.names()
+                    if not (skip_slots and isOptimizerSlot(name)))
+
+
+def isOptimizerSlot(name):
+    return name.rsplit("/", 1)[-1] in ["Adagrad", "Adam", "Adam_1", "Momentum", "RMSProp", "RMSProp_1"]
+
+
+def readTable(table):
+    # yields (key, value) for every entry of the leveldb style table, in key order
+    metaindex_end = len(table) - footer_size
+    if struct.unpack_from("<Q", table, len(table) - 8)[0] != table_magic:
+        raise ValueError("Not a checkpoint index file")
+
+    _, pos = readVarint(table, metaindex_end)  # metaindex offset, nothing in it is needed
+    _, pos = readVarint(table, pos)
+    index_offset, pos = readVarint(table, pos)
+    index_size, pos = readVarint(table, pos)
+
+    # every index entry points at one data block
+    for _, handle in readBlock(table, index_offset, index_size):
+        block_offset, pos = readVarint(handle, 0)
+        block_size, pos = readVarint(handle, pos)
+        for key, value in readBlock(table, block_offset, block_size):
+            yield key, value
+
+
+def readBlock(table, offset, size):
+    if table[offset + size] != 0:  # the compression type in the trailer
+        raise ValueError("Compressed checkpoint index blocks aren't supported")
+
+    block = memoryview(table)[offset:offset + size]
+    num_restarts = struct.unpack_from("<I", block, size - 4)[0]
+    end = size - 4 - 4 * num_restarts
+
+    # keys are stored as how much they share with the key before them plus the rest
+    pos = 0
+    key = b""
+    while pos < end:
+        shared, pos = readVarint(block, pos)
+        non_shared, pos = readVarint(block, pos)
+        value_length, pos = readVarint(block, pos)
+        key = key[:shared] + bytes(block[pos:pos + non_shared])
+        pos += non_shared
+        yield key, bytes(block[pos:pos + value_length])
+        pos += value_length
+
+
+if __name__ == "__main__":
+    # python checkpoint_reader.py brain/predict_2/model_layers_2_state_512.ckpt lists what's in a checkpoint
+    import sys
+
+    reader = CheckpointReader(sys.argv[1])
+    for name in reader.names():
+        entry = reader.entries[name]
+        print("{:<60}{:<20}{:>8}".format(name, str(entry.shape), np.dtype(dtypes.get(entry.dtype, np.void)).name),
+              "" if os.path.isfile(reader.dataPath(entry.shard_id)) else "(no data file)")
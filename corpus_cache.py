@@ -0,0 +1,69 @@
+from __future__ import print_function, division
+import json
+import os
+import numpy as np
+import char_codec
+
+# keeps an encoded copy of a text file next to it so the predict_* scripts don't re-read and re-encode the corpus
+# every run. the cache is memory mapped, so loading it costs the same no matter how big the corpus is and every
+# training process running at once shares the same pages
+# the header records what the cache was built from, if the text file or the char map changes it gets rebuilt
+
+cache_version = 1  # bump this if cleanText changes
+
+
+def cleanText(text):
+    return text.replace('\n', '').lower()
+
+
+def cachePaths(text_path):
+    return text_path + ".classes.npy", text_path + ".classes.json"
+
+
+def sourceHeader(text_path):
+    # only uses the file stats so checking the cache doesn't have to read the whole text file
+    stats = os.stat(text_path)
+    return {
+        "cache_version": cache_version,
+        "codec": char_codec.codecSignature(),
+        "source_size": stats.st_size,
+        "source_mtime": stats.st_mtime,
+    }
+
+
+def readHeader(header_path):
+    try:
+        with open(header_path, "r") as header_file:
+            return json.load(header_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def writeCache(text_path, header):
+    data_path, header_path = cachePaths(text_path)
+
+    with open(text_path, "r") as text_file:
+        indices = char_codec.stringToIndices(cleanText(text_file.read()))
+
+    # write to temporary files and rename them so a process reading at the same time never sees half a cache
+    # the header goes last since it is what marks the cache as valid
+    suffix = ".tmp" + str(os.getpid())
+    with open(data_path + suffix, "wb") as data_file:
+        np.save(data_file, indices)
+    os.rename(data_path + suffix, data_path)
+
+    with open(header_path + suffix, "w") as header_file:
+        json.dump(header, header_file)
+    os.rename(header_path + suffix, header_path)
+
+
+def loadCorpus(text_path):
+    # returns a read only uint8 array of class indices for the cleaned up text
+    data_path, header_path = cachePaths(text_path)
+    header = sourceHeader(text_path)
+
+    if readHeader(header_path) != header or not os.path.isfile(data_path):
+        print("Encoding " + text_path)
+        writeCache(text_path, header)
+
+    return np.load(data_path, mmap_mode="r")
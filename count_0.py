@@ -3,48 +3,43 @@
 # code: https://gist.github.com/monikkinom/e97d518fe02a79177b081c028a83ec1c
 # post: http://monik.in/a-noobs-guide-to-implementing-rnn-lstm-using-tensorflow/
 import numpy as np
-import random
-from random import shuffle
 import tensorflow as tf
+from rnn_layers import StackedRnn
+from binary_data import BitStringDataset
+from evaluation import ChunkedEvaluator
+from dtype_policy import DtypePolicy
 
 # from tensorflow.models.rnn import rnn_cell
 # from tensorflow.models.rnn import rnn
 
+NUM_BITS = 20  # up to binary_data.max_bits
 NUM_EXAMPLES = 10000
+MAX_TEST_EXAMPLES = 2 ** 20  # a cap on the test set, so a big NUM_BITS doesn't evaluate up to 2 ** 64 strings
+# the test set is the next NUM_TEST_EXAMPLES of the shuffled strings, all of the rest up to the cap
+NUM_TEST_EXAMPLES = min(2 ** NUM_BITS - NUM_EXAMPLES, MAX_TEST_EXAMPLES)
+DATA_SEED = None  # set to get the same shuffle, and so the same split, every run
+EVAL_CHUNK_SIZE = 10000  # the test set is evaluated this many strings at a time
+EVAL_THREADS = 4
 
-train_input = ['{0:020b}'.format(i) for i in range(2 ** 20)]
-shuffle(train_input)
-train_input = [map(int, i) for i in train_input]
-ti = []
-for i in train_input:
-    temp_list = []
-    for j in i:
-        temp_list.append([j])
-    ti.append(np.array(temp_list))
-train_input = ti
+if NUM_EXAMPLES >= 2 ** NUM_BITS:
+    raise ValueError("NUM_EXAMPLES has to be below 2 ** NUM_BITS (" + str(2 ** NUM_BITS) +
+                     ") to leave a test set, got " + str(NUM_EXAMPLES))
 
-train_output = []
-for i in train_input:
-    count = 0
-    for j in i:
-        if j[0] == 1:
-            count += 1
-    temp_list = ([0] * 21)
-    temp_list[count] = 1
-    train_output.append(temp_list)
+# every NUM_BITS long string, shuffled, made into bits and labels only a batch at a time
+dataset = BitStringDataset(NUM_BITS, DATA_SEED)
+train_indices = np.arange(NUM_EXAMPLES)
+test_indices = np.arange(NUM_EXAMPLES, NUM_EXAMPLES + NUM_TEST_EXAMPLES)
 
-test_input = train_input[NUM_EXAMPLES:]
-test_output = train_output[NUM_EXAMPLES:]
-train_input = train_input[:NUM_EXAMPLES]
-train_output = train_output[:NUM_EXAMPLES]
+print("test and training data ready")
 
-print("test and training data loaded")
-
-data = tf.placeholder(tf.float32, [None, 20, 1])  # Number of examples, number of input, dimension of each input
-target = tf.placeholder(tf.float32, [None, 21])
+# the placeholders take dtype_policy.feed_dtype arrays, data and target are them as float32
+policy = DtypePolicy()
+data_placeholder, data = policy.placeholder([None, NUM_BITS, 1])  # examples, inputs, dimension of each input
+target_placeholder, target = policy.placeholder([None, dataset.num_classes])
 num_hidden = 24
-cell = tf.nn.rnn_cell.LSTMCell(num_hidden, state_is_tuple=True)
-val, _ = tf.nn.dynamic_rnn(cell, data, dtype=tf.float32)
+cell_backend = "lstm"  # see rnn_layers.py
+rnn = StackedRnn(cell_backend, num_hidden, num_layers=1)
+val, _ = rnn(data)
 val = tf.transpose(val, [1, 0, 2])
 last = tf.gather(val, int(val.get_shape()[0]) - 1)
 weight = tf.Variable(tf.truncated_normal([num_hidden, int(target.get_shape()[1])]))
@@ -54,26 +49,35 @@ cross_entropy = -tf.reduce_sum(target * tf.log(tf.clip_by_value(prediction, 1e-1
 optimizer = tf.train.AdamOptimizer()
 minimize = optimizer.minimize(cross_entropy)
 mistakes = tf.not_equal(tf.argmax(target, 1), tf.argmax(prediction, 1))
-error = tf.reduce_mean(tf.cast(mistakes, tf.float32))
+mistake_count = tf.reduce_sum(tf.cast(mistakes, tf.float32))  # summed so the test set can be evaluated in chunks
 
 init_op = tf.global_variables_initializer()
 sess = tf.Session()
 sess.run(init_op)
 
 batch_size = 1000
-no_of_batches = int(len(train_input)) / batch_size
+no_of_batches = len(train_indices) // batch_size
 epoch = 40
 for i in range(epoch):
     ptr = 0
-    for j in range(int(no_of_batches)):
-        inp, out = train_input[ptr:ptr + batch_size], train_output[ptr:ptr + batch_size]
+    for j in range(no_of_batches):
+        inp, out = dataset.batch(train_indices[ptr:ptr + batch_size], policy.feed_dtype)
         ptr += batch_size
-        sess.run(minimize, {data: inp, target: out})
+        sess.run(minimize, {data_placeholder: inp, target_placeholder: out})
     print("Epoch ", str(i))
-incorrect = sess.run(error, {data: test_input, target: test_output})
+
+
+def testFeed(start, stop):
+    inp, out = dataset.batch(test_indices[start:stop], policy.feed_dtype)
+    return {data_placeholder: inp, target_placeholder: out}
+
+
+evaluator = ChunkedEvaluator(sess, {"error": mistake_count, "loss": cross_entropy}, EVAL_CHUNK_SIZE, EVAL_THREADS)
+test_results = evaluator.evaluate(testFeed, len(test_indices))
+incorrect = test_results["error"]
 
 np.set_printoptions(precision=1)
 print(sess.run(prediction, {
-    data: [[[1], [0], [0], [1], [1], [0], [1], [1], [1], [0], [1], [0], [0], [1], [1], [0], [1], [1], [1], [0]]]}))
-print('Epoch {:2d} error {:3.1f}%'.format(i + 1, 100 * incorrect))
+    data_placeholder: dataset.inputsOf([0b10011011101001101110], policy.feed_dtype)}))
+print('Epoch {:2d} error {:3.1f}% loss {:.4f}'.format(i + 1, 100 * incorrect, test_results["loss"]))
 sess.close()
@@ -0,0 +1,58 @@
+from __future__ import print_function, division
+import numpy as np
+
+# one place that decides the float types, so generated data, placeholders, states and weights all agree and nothing
+# gets converted again on every feed
+# everything is float32. the only choice is what the data is fed as:
+#   "float32": fed as is
+#   "bfloat16": experimental, the generators make bfloat16 arrays (half the memory of float32) and the graph casts them
+#     back to float32 right after the placeholder, so the math itself stays float32. one hot data, bits and small class
+#     numbers are exact in bfloat16, anything else loses precision. tf.bfloat16.as_numpy_dtype is what gives numpy a
+#     bfloat16 type
+# feed_dtype below picks it for every script that builds its placeholders with DtypePolicy(): add_0, count_0, echo_0,
+# echo_0_n_classes, echo_0_chars and echo_3. the rest feed class indices or numbers that bfloat16 can't hold
+# tensorflow is only imported by the parts that build graph pieces, so the numpy side (float_dtype, zeros) can be used
+# by the data modules without it
+
+float_dtype = np.float32
+feed_dtypes = ["float32", "bfloat16"]
+feed_dtype = "float32"
+
+
+class DtypePolicy(object):
+    def __init__(self, feed=None):
+        # feed: one of feed_dtypes, feed_dtype when it's left out
+        import tensorflow as tf
+
+        if feed is None:
+            feed = feed_dtype
+        if feed not in feed_dtypes:
+            raise ValueError("Unknown feed dtype " + str(feed) + ", pick one of " + str(feed_dtypes))
+        self.feed = feed
+        self.feed_tf_dtype = tf.float32 if feed == "float32" else tf.bfloat16
+        self.feed_dtype = self.feed_tf_dtype.as_numpy_dtype  # what the generators should make their arrays as
+
+    def placeholder(self, shape):
+        # returns (placeholder to feed, float32 tensor to build the graph with)
+        import tensorflow as tf
+
+        fed = tf.placeholder(dtype=self.feed_tf_dtype, shape=shape)
+        if self.feed_tf_dtype == tf.float32:
+            return fed, fed
+        return fed, tf.cast(fed, tf.float32)
+
+    def feedArray(self, array):
+        # no copy if the array already has the feed dtype
+        return np.asarray(array, dtype=self.feed_dtype)
+
+
+def floatVariable(initial_value):
+    # tf.Variable from a numpy initial value made as float32, np.random.rand and np.zeros make float64
+    import tensorflow as tf
+
+    return tf.Variable(np.asarray(initial_value, dtype=float_dtype), dtype=tf.float32)
+
+
+def zeros(shape):
+    # float32 zeros, for states and buffers that get fed
+    return np.zeros(shape, dtype=float_dtype)
@@ -10,6 +10,9 @@ from __future__ import print_function, division
 import numpy as np
 import tensorflow as tf
 import matplotlib.pyplot as plt
+from background import BatchPrefetcher
+from metrics import LossTracker
+from dtype_policy import DtypePolicy, floatVariable, zeros
 
 echo_step = 3  # by how many bits is the input shifted to produce the output
 num_epochs = 100  # how many epochs of training should we do?
@@ -21,6 +24,8 @@ batch_size = 5  # how many series to process simultaneously. look at "Schematic
 # how many batches will be done to go over all the data
 batches_per_epoch = total_series_length // batch_size // truncated_backprop_length
 learning_rate = 0.5  # rate passed to optimizer (this value is important)
+policy = DtypePolicy()  # the inputs are made and fed as policy.feed_dtype, see dtype_policy
+
 
 def generateData():
     # 2 defines [0,1] as rand range, then how many, then the odds of each
@@ -29,32 +34,33 @@ def generateData():
     y[0:echo_step] = 0  # sets the beginning values here to be 0 since they are garbage
 
     # reshape this into a 2d vector where each entry has batch_size elements and an unknown (-1) number of entries in it
-    x = x.reshape((batch_size, -1))
-    y = y.reshape((batch_size, -1))
+    # made in the dtypes of the placeholders here, once an epoch, so no feed has to convert them
+    x = x.astype(policy.feed_dtype).reshape((batch_size, -1))
+    y = y.astype(np.int32).reshape((batch_size, -1))
 
     return x, y  # have shapes[batch_size, (remainder)] in this case, [5, 10000]
 
 
 # input, output, and state types
-batchX_placeholder = tf.placeholder(dtype=tf.float32, shape=[batch_size, truncated_backprop_length])
+batchX_placeholder, batchX_inputs = policy.placeholder([batch_size, truncated_backprop_length])
 batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, truncated_backprop_length])
 init_state = tf.placeholder(dtype=tf.float32,
                             shape=[batch_size, state_size])  # this is a RNN, so we need a state type too
 
 # used to compute the state given the old state and NEW input
 # note that this is not an LSTM for at least 1 reason: the OLD output was not fed to us
-state_weight = tf.Variable(np.random.rand(state_size + 1, state_size), dtype=tf.float32)
-state_bias = tf.Variable(np.zeros(shape=(1, state_size)), dtype=tf.float32)
+state_weight = floatVariable(np.random.rand(state_size + 1, state_size))
+state_bias = floatVariable(np.zeros(shape=(1, state_size)))
 
 # used to compute the output given the state
-output_weight = tf.Variable(np.random.rand(state_size, num_classes), dtype=tf.float32)
-output_bias = tf.Variable(np.zeros(shape=(1, num_classes)), dtype=tf.float32)
+output_weight = floatVariable(np.random.rand(state_size, num_classes))
+output_bias = floatVariable(np.zeros(shape=(1, num_classes)))
 
 # Unpack columns
 # keep in mind truncated_backprop_length = 30
 # this splits the [truncated_backprop_length, batch_size] tensors into (30) different tensors of shape (5,)
 # these are now lists of (30) tensors, each one defining a single cell's input or output per batch
-inputs_series = tf.unstack(batchX_placeholder, axis=1)  # axis=1 says to split on the 2nd dimension (indexed on 0)
+inputs_series = tf.unstack(batchX_inputs, axis=1)  # axis=1 says to split on the 2nd dimension (indexed on 0)
 labels_series = tf.unstack(batchY_placeholder, axis=1)
 
 # Forward pass
@@ -121,6 +127,9 @@ def plot(loss_list, predictions_series, batchX, batchY):
     plt.pause(0.0001)
 
 
+# builds the next epochs of data on another thread while the current one trains
+epoch_data = BatchPrefetcher(generateData, depth=2)
+
 np.set_printoptions(precision=1)
 with tf.Session() as sess:
     sess = tf.Session()
@@ -129,14 +138,14 @@ with tf.Session() as sess:
     plt.ion()
     plt.figure()
     plt.show()
-    loss_list = []
+    loss_tracker = LossTracker(average_over=1)  # keeps the loss history in constant memory
 
     # one epoch will go through all the training data
     # each epoch will call to generate more data
     # (likely to be different data in this case since rand, but generally doesn't have to be if you have limited data)
     for epoch in range(num_epochs):
-        x, y = generateData()
-        _current_state = np.zeros((batch_size, state_size))
+        x, y = epoch_data.get()
+        _current_state = zeros((batch_size, state_size))
 
         print("New data, epoch:", epoch)
 
@@ -162,17 +171,13 @@ with tf.Session() as sess:
                 })
 
             # keep track of the loss values so we can plot them
-            loss_list.append(_total_loss)
-
-            # don't display more than n in the graph
-            if(len(loss_list) > 2000):
-                del loss_list[0]
+            loss_tracker.add(_total_loss)
 
             # every n batches, print an update
             if batch_i % 100 == 0:
-                print("Step:", batch_i, "Loss:", _total_loss)
+                print("Step:", batch_i, "Loss:", _total_loss, loss_tracker.summaryString())
                 # update the plots
-                plot(loss_list, _predictions_series, batchX, batchY)
+                plot(loss_tracker.history.values(), _predictions_series, batchX, batchY)
 
                 if batch_i % 500 == 0:
                     mini_batch_prediction = []
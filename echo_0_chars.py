@@ -4,17 +4,18 @@ from __future__ import print_function, division
 import numpy as np
 import tensorflow as tf
 import matplotlib.pyplot as plt
+from background import BatchPrefetcher
+from metrics import LossTracker
+import char_codec
+from dtype_policy import DtypePolicy, floatVariable, zeros
 
 num_classes = 2
 
 def charToClass(char):
-    classification = np.zeros(26)
-    index = ord(char) - ord('a')
-    classification[index] = 1
-    return classification
+    return char_codec.charToClass(char, char_codec.base)
 
 def classToChar(arry):
-    return chr(np.argmax(arry) + ord('a'))
+    return char_codec.classToChar(arry)
 
 def stringToBits(str, requestedChars):
     bits = []
@@ -46,6 +47,8 @@ str = bitsToString(bitArray, 2)
 print (str)
 
 batch_size = 5
+policy = DtypePolicy()  # the inputs are made and fed as policy.feed_dtype, see dtype_policy
+
 
 def generateData():
     text = "abcd"
@@ -71,8 +74,9 @@ def generateData():
         x.append(batchXx)
         y.append(batchYy)
 
-    x = np.asarray(x)
-    y = np.asarray(y)
+    # made in the dtypes of the placeholders here, once an epoch, so no feed has to convert them
+    x = np.asarray(x, dtype=policy.feed_dtype)
+    y = np.asarray(y, dtype=np.int32)
 
     return x, y, num_chars
 
@@ -85,19 +89,19 @@ state_size = 6
 num_batches = total_series_length // batch_size // truncated_backprop_length
 
 
-batchX_placeholder = tf.placeholder(tf.float32, [batch_size, truncated_backprop_length])
+batchX_placeholder, batchX_inputs = policy.placeholder([batch_size, truncated_backprop_length])
 batchY_placeholder = tf.placeholder(tf.int32, [batch_size, truncated_backprop_length])
 
 init_state = tf.placeholder(tf.float32, [batch_size, state_size])
 
-W = tf.Variable(np.random.rand(state_size + 1, state_size), dtype=tf.float32)
-b = tf.Variable(np.zeros((1, state_size)), dtype=tf.float32)
+W = floatVariable(np.random.rand(state_size + 1, state_size))
+b = floatVariable(np.zeros((1, state_size)))
 
-W2 = tf.Variable(np.random.rand(state_size, num_classes), dtype=tf.float32)
-b2 = tf.Variable(np.zeros((1, num_classes)), dtype=tf.float32)
+W2 = floatVariable(np.random.rand(state_size, num_classes))
+b2 = floatVariable(np.zeros((1, num_classes)))
 
 # Unpack columns
-inputs_series = tf.unstack(batchX_placeholder, axis=1)
+inputs_series = tf.unstack(batchX_inputs, axis=1)
 labels_series = tf.unstack(batchY_placeholder, axis=1)
 
 # Forward pass
@@ -142,6 +146,9 @@ def plot(loss_list, predictions_series, batchX, batchY):
     plt.pause(0.0001)
 
 print ("Starting To Train")
+# builds the next epochs of data on another thread while the current one trains
+epoch_data = BatchPrefetcher(generateData, depth=2)
+
 np.set_printoptions(precision=1)
 with tf.Session() as sess:
     init_op = tf.global_variables_initializer()
@@ -151,11 +158,11 @@ with tf.Session() as sess:
     plt.ion()
     plt.figure()
     plt.show()
-    loss_list = []
+    loss_tracker = LossTracker(average_over=1)  # keeps the loss history in constant memory
 
     for epoch_idx in range(num_epochs):
-        x, y, _ = generateData()
-        _current_state = np.zeros((batch_size, state_size))
+        x, y, _ = epoch_data.get()
+        _current_state = zeros((batch_size, state_size))
 
         print("New data, epoch", epoch_idx)
 
@@ -197,11 +204,11 @@ with tf.Session() as sess:
                     init_state: _current_state
                 })
 
-            loss_list.append(_total_loss)
+            loss_tracker.add(_total_loss)
 
             if batch_idx % 100 == 0:
-                print("Step", batch_idx, "Loss", _total_loss)
-                plot(loss_list, _predictions_series, batchX, batchY)
+                print("Step", batch_idx, "Loss", _total_loss, loss_tracker.summaryString())
+                plot(loss_tracker.history.values(), _predictions_series, batchX, batchY)
 
 plt.ioff()
 plt.show()
@@ -1,5 +1,5 @@
 
-# improved version takes onehot and outputs onehot explicitly
+# improved version works on one hot inputs and outputs explicitly, fed as class indices and expanded in the graph
 
 # echos inputs
 # can use many different output_classes
@@ -21,6 +21,10 @@ from __future__ import print_function, division
 import numpy as np
 import tensorflow as tf
 import matplotlib.pyplot as plt
+from background import BatchPrefetcher
+from metrics import LossTracker
+from echo_data import randomClasses, echoData
+from dtype_policy import floatVariable, zeros
 
 echo_step = 3  # by how many bits is the input shifted to produce the output
 num_epochs = 100  # how many epochs of training should we do?
@@ -32,52 +36,40 @@ batch_size = 5  # how many series to process simultaneously. look at "Schematic
 # how many batches will be done to go over all the data, note that since we are using integer division: //
 # not all the data will get used
 batches_per_epoch = epoch_input_length // batch_size // truncated_backprop_length  # results in 333
+num_loss_avg = 20  # average accross this many losses for the plot to prevent spikes
 learning_rate = 0.3  # rate passed to optimizer (this value is important)
 input_classes = output_classes
 
 
-def generateRandomClassVector():
-    vector = np.zeros(input_classes)
-    vector[np.random.randint(0, input_classes)] = 1
-    return vector
-
-
 def generateData():
-    inputs = np.empty((epoch_input_length, input_classes))
-    for i in range(epoch_input_length):
-        v = generateRandomClassVector()
-        inputs[i] = v
-
-    outputs = np.roll(inputs, echo_step)  # just shifts the whole bit list over by echo_step
-
-    # reshape this into a 2d vector where each entry has batch_size elements and an unknown (-1) number of entries in it
-    inputs = inputs.reshape((batch_size, -1, input_classes))
-    outputs = outputs.reshape((batch_size, -1, output_classes))
-
-    return inputs, outputs  # have shapes[batch_size, (remainder)] in this case, [5, 10000]
+    classes = randomClasses(epoch_input_length, input_classes)
+    # shifted by echo_step time steps, reshaped to class indices of shape [batch_size, (remainder)], [5, 10000] here
+    return echoData(classes, echo_step, batch_size)
 
 
 # input, output, and state types
-batchX_placeholder = tf.placeholder(dtype=tf.float32, shape=[batch_size, truncated_backprop_length, input_classes])
-batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, truncated_backprop_length, output_classes])
+# class indices [batch_size, truncated_backprop_length], the inputs are only expanded to one hot inside the graph
+batchX_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, truncated_backprop_length])
+batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, truncated_backprop_length])
+inputs = tf.one_hot(batchX_placeholder, input_classes)  # [batch_size, truncated_backprop_length, input_classes]
 init_state = tf.placeholder(dtype=tf.float32,
                             shape=[batch_size, state_size])  # this is a RNN, so we need a state type too
 
 # used to compute the state given the old state and NEW input
 # note that this is not an LSTM for at least 1 reason: the OLD output was not fed to us
-state_weight = tf.Variable(np.random.rand(state_size + input_classes, state_size), dtype=tf.float32)
-state_bias = tf.Variable(np.zeros(shape=(1, state_size)), dtype=tf.float32)
+state_weight = floatVariable(np.random.rand(state_size + input_classes, state_size))
+state_bias = floatVariable(np.zeros(shape=(1, state_size)))
 
 # used to compute the output given the state
-output_weight = tf.Variable(np.random.rand(state_size, output_classes), dtype=tf.float32)
-output_bias = tf.Variable(np.zeros(shape=(1, output_classes)), dtype=tf.float32)
+output_weight = floatVariable(np.random.rand(state_size, output_classes))
+output_bias = floatVariable(np.zeros(shape=(1, output_classes)))
 
 # Unpack columns
 # keep in mind truncated_backprop_length = 30
 # this splits the [truncated_backprop_length, batch_size] tensors
 # into (truncated_backprop_length) different tensors of shape (batch_size, input_classes)
 # these are now lists of (30) tensors, each one defining a single cell's input or output per batch
-inputs_series = tf.unstack(batchX_placeholder, axis=1)  # axis=1 says to split on the 2nd dimension (indexed on 0)
+inputs_series = tf.unstack(inputs, axis=1)  # axis=1 says to split on the 2nd dimension (indexed on 0)
 labels_series = tf.unstack(batchY_placeholder, axis=1)
 
 # Forward pass
@@ -119,7 +111,7 @@ predictions_series = [tf.nn.softmax(logits) for logits in logits_series]  # or y
 # note that the logits results in a vector that is onehot encoded, so [0 0 1 0], but labels is just the value of the
 # index that should be 1, so 2. That is what sparse_softmax_cross_entropy_with_logits does
 # https://stackoverflow.com/questions/37312421/tensorflow-whats-the-difference-between-sparse-softmax-cross-entropy-with-logi
-losses = [tf.nn.softmax_cross_entropy_with_logits(logits=logits, labels=labels) for logits, labels in
+losses = [tf.nn.sparse_softmax_cross_entropy_with_logits(logits=logits, labels=labels) for logits, labels in
           zip(logits_series, labels_series)]
 
 # computes average value across all values in input_tensor (can do more if fed more values)
@@ -157,10 +149,10 @@ def plot(loss_list, predictions_series, batchX, batchY):
 
         print()
 
-        plt.bar(x=left_offset, height=decode(batchX[batch_series_idx, :]) * barHeight, bottom=nextBars * 2, width=1,
+        plt.bar(x=left_offset, height=batchX[batch_series_idx, :] * barHeight, bottom=nextBars * 2, width=1,
                 color="red")  # input
 
-        plt.bar(x=left_offset, height=decode(batchY[batch_series_idx, :]) * barHeight, bottom=nextBars * 1, width=1,
+        plt.bar(x=left_offset, height=batchY[batch_series_idx, :] * barHeight, bottom=nextBars * 1, width=1,
                 color="green")  # output
 
         plt.bar(x=left_offset, height=single_output_series * barHeight, bottom=nextBars * 0, width=1,
@@ -170,6 +162,9 @@ def plot(loss_list, predictions_series, batchX, batchY):
     plt.pause(0.0001)
 
 
+# builds the next epochs of data on another thread while the current one trains
+epoch_data = BatchPrefetcher(generateData, depth=2)
+
 np.set_printoptions(precision=1)
 with tf.Session() as sess:
     sess = tf.Session()
@@ -178,18 +173,17 @@ with tf.Session() as sess:
     plt.ion()
     plt.figure()
     plt.show()
-    loss_list = []
+    loss_tracker = LossTracker(average_over=num_loss_avg)  # keeps the loss history in constant memory
 
     # one epoch will go through all the training data
     # each epoch will call to generate more data
     # (likely to be different data in this case since rand, but generally doesn't have to be if you have limited data)
     for epoch in range(num_epochs):
-        x, y = generateData()
-        _current_state = np.zeros((batch_size, state_size))
+        x, y = epoch_data.get()
+        _current_state = zeros((batch_size, state_size))
 
         print("New data, epoch:", epoch)
 
-        sub_loss_list = []  # store the loss value because displaying every single one is silly
         for batch_i in range(batches_per_epoch):
             # find where in the data to start for this batch
             start_batch_pos = batch_i * truncated_backprop_length
@@ -215,23 +209,13 @@ with tf.Session() as sess:
                 })
 
             # keep track of the loss values so we can plot them
-            sub_loss_list.append(_total_loss)
-            num_loss_avg = 20  # average accross this many to prevent spikes
-            if (len(sub_loss_list) >= num_loss_avg):
-                averageValue = [np.average(sub_loss_list)]
-                averageValue = averageValue * num_loss_avg  # repeat this value num_loss_avg times
-                sub_loss_list = []
-                loss_list.extend(averageValue)
-
-            # don't display more than n in the graph
-            #if (len(loss_list) > 2000):
-            #    del loss_list[0]
+            loss_tracker.add(_total_loss)
 
             # every n batches, print an update
             if batch_i % 100 == 0:
-                print("Step:", batch_i, "Loss:", _total_loss)
+                print("Step:", batch_i, "Loss:", _total_loss, loss_tracker.summaryString())
                 # update the plots
-                plot(loss_list, _predictions_series, batchX, batchY)
+                plot(loss_tracker.history.values(), _predictions_series, batchX, batchY)
 
                 if batch_i % 400 == 0:
                     mini_batch_prediction = []
@@ -251,7 +235,7 @@ with tf.Session() as sess:
                     # into probabilities.
                     # out[0] is the probability of 0 being the right answer
                     # out[1] is the probability of 1 being the right answer
-                    rounded_answer = decode(batchY[batch_series_i, :])
+                    rounded_answer = batchY[batch_series_i, :]
                     rounded_prediction = decode(mini_batch_prediction)
 
                     print("Answer:")
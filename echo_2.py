@@ -1,4 +1,4 @@
-# improved version takes onehot and outputs onehot explicitly
+# improved version works on one hot inputs and outputs explicitly, fed as class indices and expanded in the graph
 
 # echos inputs
 # can use many different output_classes
@@ -19,7 +19,12 @@
 from __future__ import print_function, division
 import numpy as np
 import tensorflow as tf
-import matplotlib.pyplot as plt
+from background import BatchPrefetcher
+from echo_data import randomClasses, echoData
+from live_plot import LivePlot
+from metrics import LossTracker
+from rnn_layers import StackedRnn, projectSeries, ResidentState
+from dtype_policy import floatVariable, zeros
 
 echo_step = 3  # by how many bits is the input shifted to produce the output
 num_epochs = 100  # how many epochs of training should we do?
@@ -31,90 +36,83 @@ batch_size = 5  # how many series to process simultaneously. look at "Schematic
 # how many batches will be done to go over all the data, note that since we are using integer division: //
 # not all the data will get used
 batches_per_epoch = epoch_input_length // batch_size // bpl  # results in 333
+headless = False  # train without the plot window, matplotlib is never imported
+num_loss_avg = 20  # average accross this many losses for the plot to prevent spikes
+data_seed = None  # set this to train on the same data every run
 learning_rate = 0.1  # rate passed to optimizer (this value is important)
+stateful = True  # keep the state in the graph between windows instead of feeding it back in every step
+cell_backend = "basic_lstm"  # which cell to use, see rnn_layers.py. "lstm", "block" or "gru" work too
 input_classes = output_classes
 
 
-def generateRandomClassVector():
-    vector = np.zeros(input_classes)
-    vector[np.random.randint(0, input_classes)] = 1
-    return vector
+data_rng = np.random.RandomState(data_seed)
 
 
 def generateData():
-    inputs = np.empty((epoch_input_length, input_classes))
-    for i in range(epoch_input_length):
-        v = generateRandomClassVector()
-        inputs[i] = v
-
-    outputs = np.roll(inputs, echo_step)  # just shifts the whole bit list over by echo_step
-
-    # reshape this into a 2d vector where each entry has batch_size elements and an unknown (-1) number of entries in it
-    inputs = inputs.reshape((batch_size, -1, input_classes))
-    outputs = outputs.reshape((batch_size, -1, output_classes))
-
-    return inputs, outputs  # have shapes[batch_size, (remainder)] in this case, [5, 10000]
+    classes = randomClasses(epoch_input_length, input_classes, data_rng)
+    # [batch_size, (remainder)] class indices
+    return echoData(classes, echo_step, batch_size)
 
 
 # input, output, and state types
-batchX_placeholder = tf.placeholder(dtype=tf.float32, shape=[batch_size, bpl, input_classes])
-batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, bpl, output_classes])
-
-cell_state = tf.placeholder(tf.float32, [batch_size, state_size])
-hidden_state = tf.placeholder(tf.float32, [batch_size, state_size])
-init_state = tf.nn.rnn_cell.LSTMStateTuple(cell_state, hidden_state)
+# input and output class indices [batch_size, bpl], the inputs are only expanded to one hot inside the graph and the
+# answers go straight to sparse_softmax_cross_entropy_with_logits
+batchX_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, bpl])
+batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[batch_size, bpl])
+rnn_inputs = tf.one_hot(batchX_placeholder, input_classes)  # [batch_size, bpl, input_classes]
+
+rnn = StackedRnn(cell_backend, state_size, 1)
+if stateful:
+    # the state stays in variables of the graph between windows, see rnn_layers.ResidentState
+    resident_state = ResidentState(rnn.zero_state(batch_size, tf.float32))
+    init_state = resident_state.state
+else:
+    cell_state = tf.placeholder(tf.float32, [batch_size, state_size])
+    hidden_state = tf.placeholder(tf.float32, [batch_size, state_size])
+    init_state = (tf.nn.rnn_cell.LSTMStateTuple(cell_state, hidden_state),)  # one (c, h) per layer
 
 
 # used to compute the state given the old state and NEW input
 # note that this is not an LSTM for at least 1 reason: the OLD output was not fed to us
-state_weight = tf.Variable(np.random.rand(state_size + input_classes, state_size), dtype=tf.float32)
-state_bias = tf.Variable(np.zeros(shape=(1, state_size)), dtype=tf.float32)
+state_weight = floatVariable(np.random.rand(state_size + input_classes, state_size))
+state_bias = floatVariable(np.zeros(shape=(1, state_size)))
 
 # used to compute the output given the state
-output_weight = tf.Variable(np.random.rand(state_size, output_classes), dtype=tf.float32)
-output_bias = tf.Variable(np.zeros(shape=(1, output_classes)), dtype=tf.float32)
+output_weight = floatVariable(np.random.rand(state_size, output_classes))
+output_bias = floatVariable(np.zeros(shape=(1, output_classes)))
 
 # Unpack columns
-# defines a basic RNN cell with a given state size
+# runs the cell (built above, with a given state size) over the whole window
 # time_major=False just dictates the order of the shape of inputs
 # states_series is a tensor of shape [batch_size, bpl, state_size]
 # current state isn't really used here
-cell = tf.nn.rnn_cell.BasicLSTMCell(state_size, state_is_tuple=True)
-states_series, current_state = tf.nn.dynamic_rnn(cell=cell, inputs=batchX_placeholder, initial_state=init_state, time_major=False)
+states_series, current_state = rnn(rnn_inputs, initial_state=init_state, time_major=False)
 
-# shape [bpl, batch_size, output_classes]
-# the input has been wrapped into the states_series list
+# one matmul for every time step of every series at once, shape [batch_size, bpl, output_classes]
 # LSTM: the states_series is storing the top line having already been through tanh, multiplying x and adding bias +
-# LSTM: logits_series is the LSTM output ht, computed by tanh(state) * w2 + b
-logits_series = []  # = tf.placeholder(dtype=tf.float32, shape=[bpl, batch_size, output_classes])
-states_series = tf.transpose(states_series, [1, 0, 2]) # reshape the states_series because tf is Jank A.F.
-for i in range(bpl):  # logits_series is basically output series with size [30, output_classes]
-    logits_series.append(tf.matmul(states_series[i], output_weight) + output_bias)
-
+# LSTM: logits is the LSTM output ht, computed by tanh(state) * w2 + b
+logits = projectSeries(states_series, output_weight, output_bias)
 
 # create another output, but apply (next line)
 # softmax (which basically just turns the output into probabilities instead of arbitrary
 # values, so they sum to 1: [0.1, 0.4] would be turned to [0.2, 0.8], or [3, 6] -> [0.33, 0.33]
-# just looking at logits_series is also fine
+# just looking at logits is also fine
 # defines what the nn should pass back to us for this argument
-predictions_series = []
-for i in range(bpl):
-    predictions_series.append(tf.nn.softmax(logits_series[i]))
+predictions_series = tf.nn.softmax(logits)  # [batch_size, bpl, output_classes]
 
 # compute how wrong the guess is by comparing the output(logits) to the correct output (labels)
 # note that the logits results in a vector that is onehot encoded, so [0 0 1 0], but labels is just the value of the
 # index that should be 1, so 2. That is what sparse_softmax_cross_entropy_with_logits does
 # https://stackoverflow.com/questions/37312421/tensorflow-whats-the-difference-between-sparse-softmax-cross-entropy-with-logi
-
-labels_series = tf.unstack(batchY_placeholder, axis=1)  # reshape so it can be used in zip
-losses = [tf.nn.softmax_cross_entropy_with_logits(logits=logits, labels=labels) for logits, labels in
-          zip(logits_series, labels_series)]
+losses = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=logits, labels=batchY_placeholder)  # [batch_size, bpl]
 
 # computes average value across all values in input_tensor (can do more if fed more values)
 total_loss = tf.reduce_mean(input_tensor=losses)
 
 # does backprop for us (corrects our tf variables so they are more accurate)
 train_step = tf.train.AdagradOptimizer(learning_rate=learning_rate).minimize(total_loss)
+if stateful:
+    train_step = resident_state.update(current_state, after=[train_step])  # keeps the state for the next window
 
 
 def decode(coded):
@@ -125,60 +123,35 @@ def decode(coded):
     return vals
 
 
-def plot(loss_list, predictions_series, batchX, batchY):
-    ax = plt.subplot(2, 3, 1)
-    plt.cla()
-    plt.plot(loss_list)
-    ax.set_ylim(ymin=0)  # always show y0 and
-
-    for batch_series_idx in range(5):
-        coded = np.array(predictions_series)[:, batch_series_idx, :]
-        single_output_series = decode(coded)
+# keeps the loss history in constant memory however long the run is
+loss_tracker = LossTracker(average_over=num_loss_avg)
 
-        plt.subplot(2, 3, batch_series_idx + 2)  # select the next plot to draw on
-        plt.cla()
-        plt.axis([0, bpl, 0, 2])
-        left_offset = range(bpl)
-
-        barHeight = 0.1
-        nextBars = barHeight * output_classes
-
-        print()
-
-        plt.bar(x=left_offset, height=decode(batchX[batch_series_idx, :]) * barHeight, bottom=nextBars * 2, width=1,
-                color="red")  # input
-
-        plt.bar(x=left_offset, height=decode(batchY[batch_series_idx, :]) * barHeight, bottom=nextBars * 1, width=1,
-                color="green")  # output
-
-        plt.bar(x=left_offset, height=single_output_series * barHeight, bottom=nextBars * 0, width=1,
-                color="blue")  # network guess
-
-    plt.draw()
-    plt.pause(0.0001)
+# draws in its own process, it has to start before the session does since it forks this one
+live_plot = LivePlot(bpl, output_classes, headless)
 
+# builds the next epochs of data on another thread while the current one trains
+epoch_data = BatchPrefetcher(generateData, depth=2)
 
 np.set_printoptions(precision=1)
 with tf.Session() as sess:
     sess = tf.Session()
     sess.run(tf.global_variables_initializer())
-
-    plt.ion()
-    plt.figure()
-    plt.show()
-    loss_list = []
+    sess.run(tf.local_variables_initializer())  # the resident state, when stateful
 
     # one epoch will go through all the training data
     # each epoch will call to generate more data
     # (likely to be different data in this case since rand, but generally doesn't have to be if you have limited data)
     for epoch in range(num_epochs):
-        x, y = generateData()
-        _current_cell_state = np.zeros((batch_size, state_size))
-        _current_hidden_state = np.zeros((batch_size, state_size))
+        x, y = epoch_data.get()
+        # the state is only reset here and carried from window to window inside the epoch
+        if stateful:
+            sess.run(resident_state.reset)
+        else:
+            _current_cell_state = zeros((batch_size, state_size))
+            _current_hidden_state = zeros((batch_size, state_size))
 
         print("New data, epoch:", epoch)
 
-        sub_loss_list = []  # store the loss value because displaying every single one is silly
         for batch_i in range(batches_per_epoch):
             # find where in the data to start for this batch
             start_batch_pos = batch_i * bpl
@@ -193,36 +166,33 @@ with tf.Session() as sess:
             # _total_loss is just the average loss across this batch, so a float
             # _train_step is None
             # _current_state is shape [5, 4] because [batch_size, state_size] it will be fed to next batch
-            # _predictions_series has shape [30, 5, 2] because [bpl, batch_size, output_classes]
-            _total_loss, _train_step, _current_state, _predictions_series = sess.run(
-                [total_loss, train_step, current_state, predictions_series],
-                feed_dict={
-                    batchX_placeholder: batchX,  # input for this batch
-                    batchY_placeholder: batchY,  # output (answers) for this batch
-                    cell_state: _current_cell_state,
-                    hidden_state: _current_hidden_state
-                })
-
-            _current_cell_state, _current_hidden_state = _current_state
+            # _predictions_series has shape [5, 30, 2] because [batch_size, bpl, output_classes]
+            feed_dict = {
+                batchX_placeholder: batchX,  # input for this batch
+                batchY_placeholder: batchY,  # output (answers) for this batch
+            }
+
+            if stateful:
+                _total_loss, _train_step, _predictions_series = sess.run(
+                    [total_loss, train_step, predictions_series], feed_dict=feed_dict)
+            else:
+                feed_dict[cell_state] = _current_cell_state
+                feed_dict[hidden_state] = _current_hidden_state
+                _total_loss, _train_step, _current_state, _predictions_series = sess.run(
+                    [total_loss, train_step, current_state, predictions_series], feed_dict=feed_dict)
+
+                _current_cell_state, _current_hidden_state = _current_state[0]
 
             # keep track of the loss values so we can plot them
-            sub_loss_list.append(_total_loss)
-            num_loss_avg = 20  # average accross this many to prevent spikes
-            if (len(sub_loss_list) >= num_loss_avg):
-                averageValue = [np.average(sub_loss_list)]
-                averageValue = averageValue * num_loss_avg  # repeat this value num_loss_avg times
-                sub_loss_list = []
-                loss_list.extend(averageValue)
-
-            # don't display more than n in the graph
-            # if (len(loss_list) > 2000):
-            #    del loss_list[0]
+            average = loss_tracker.add(_total_loss)
+            if average is not None:
+                live_plot.addLoss(average)
 
             # every n batches, print an update
             if batch_i % 100 == 0:
-                print("Step:", batch_i, "Loss:", _total_loss)
+                print("Step:", batch_i, "Loss:", _total_loss, loss_tracker.summaryString())
                 # update the plots
-                plot(loss_list, _predictions_series, batchX, batchY)
+                live_plot.update(batchX, batchY, np.argmax(_predictions_series, axis=2))
 
                 if batch_i % 400 == 0:
                     mini_batch_prediction = []
@@ -230,11 +200,10 @@ with tf.Session() as sess:
                     batch_series_i = 2  # use the third run so the state and first few values make sense
                     # TODO why do the values still not make sense?
 
-                    # predictions_series has shape [30, 5, 2]
-                    # because [bpl, batch_size, output_classes]
-                    # np.array so we can use fancy index -> [magic, python, indexing]
+                    # predictions_series has shape [5, 30, 2]
+                    # because [batch_size, bpl, output_classes]
                     # grab all time outputs, for batch (batch_series_i) and all class output values
-                    mini_batch_prediction = np.array(_predictions_series)[:, batch_series_i, :]
+                    mini_batch_prediction = _predictions_series[batch_series_i]
 
                     # each output is a list [output_classes]
                     # decode mini_batch_prediction outputs to go to either 0 or 1 instead of the one hot classes
@@ -242,7 +211,7 @@ with tf.Session() as sess:
                     # into probabilities.
                     # out[0] is the probability of 0 being the right answer
                     # out[1] is the probability of 1 being the right answer
-                    rounded_answer = decode(batchY[batch_series_i, :])
+                    rounded_answer = batchY[batch_series_i, :]
                     rounded_prediction = decode(mini_batch_prediction)
 
                     print("Answer:")
@@ -254,7 +223,8 @@ with tf.Session() as sess:
                     print(*rounded_prediction, sep=" ", end="")
                     print("]")
                     print("Resulting State:")
+                    if stateful:
+                        _current_cell_state = sess.run(resident_state.state)[0].c  # only read when it's printed
                     print(_current_cell_state[batch_series_i])  # the resulting state after the run
 
-plt.ioff()
-plt.show()
+live_plot.close()
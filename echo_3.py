@@ -3,6 +3,10 @@ from __future__ import print_function, division
 import numpy as np
 import tensorflow as tf
 import matplotlib.pyplot as plt
+from background import BatchPrefetcher
+from metrics import LossTracker
+from rnn_layers import StackedRnn
+from dtype_policy import DtypePolicy, floatVariable, zeros
 
 num_epochs = 100
 total_series_length = 50000
@@ -13,18 +17,22 @@ echo_step = 3
 batch_size = 5
 num_batches = total_series_length//batch_size//truncated_backprop_length
 num_layers = 3
+cell_backend = "lstm"  # which cell to stack, see rnn_layers.py
+policy = DtypePolicy()  # the inputs are made and fed as policy.feed_dtype, see dtype_policy
+
 
 def generateData():
     x = np.array(np.random.choice(2, total_series_length, p=[0.5, 0.5]))
     y = np.roll(x, echo_step)
     y[0:echo_step] = 0
 
-    x = x.reshape((batch_size, -1))  # The first index changing slowest, subseries as rows
-    y = y.reshape((batch_size, -1))
+    # made in the dtypes of the placeholders here, once an epoch, so no feed has to convert them
+    x = x.astype(policy.feed_dtype).reshape((batch_size, -1))  # The first index changing slowest, subseries as rows
+    y = y.astype(np.int32).reshape((batch_size, -1))
 
     return (x, y)
 
-batchX_placeholder = tf.placeholder(tf.float32, [batch_size, truncated_backprop_length, 2])
+batchX_placeholder, batchX_inputs = policy.placeholder([batch_size, truncated_backprop_length, 2])
 batchY_placeholder = tf.placeholder(tf.int32, [batch_size, truncated_backprop_length])
 
 init_state = tf.placeholder(tf.float32, [num_layers, 2, batch_size, state_size])
@@ -35,17 +43,16 @@ rnn_tuple_state = tuple(
      for idx in range(num_layers)]
 )
 
-W2 = tf.Variable(np.random.rand(state_size, num_classes),dtype=tf.float32)
-b2 = tf.Variable(np.zeros((1,num_classes)), dtype=tf.float32)
+W2 = floatVariable(np.random.rand(state_size, num_classes))
+b2 = floatVariable(np.zeros((1,num_classes)))
 
 # Unpack columns
-inputs_series = tf.split(batchX_placeholder, truncated_backprop_length, axis=1)
+inputs_series = tf.split(batchX_inputs, truncated_backprop_length, axis=1)
 labels_series = tf.unstack(batchY_placeholder, axis=1)
 
 # Forward passes
-cell = tf.nn.rnn_cell.LSTMCell(state_size, state_is_tuple=True)
-cell = tf.nn.rnn_cell.MultiRNNCell([cell] * num_layers, state_is_tuple=True)
-states_series, current_state = tf.nn.dynamic_rnn(cell, inputs=inputs_series, initial_state=rnn_tuple_state)
+rnn = StackedRnn(cell_backend, state_size, num_layers)
+states_series, current_state = rnn(inputs_series, initial_state=rnn_tuple_state)
 
 logits_series = [tf.matmul(state, W2) + b2 for state in states_series] #Broadcasted addition
 predictions_series = [tf.nn.softmax(logits) for logits in logits_series]
@@ -76,17 +83,20 @@ def plot(loss_list, predictions_series, batchX, batchY):
     plt.pause(0.0001)
 
 
+# builds the next epochs of data on another thread while the current one trains
+epoch_data = BatchPrefetcher(generateData, depth=2)
+
 with tf.Session() as sess:
     sess.run(tf.initialize_all_variables())
     plt.ion()
     plt.figure()
     plt.show()
-    loss_list = []
+    loss_tracker = LossTracker(average_over=1)  # keeps the loss history in constant memory
 
     for epoch_idx in range(num_epochs):
-        x,y = generateData()
+        x,y = epoch_data.get()
 
-        _current_state = np.zeros((num_layers, 2, batch_size, state_size))
+        _current_state = zeros((num_layers, 2, batch_size, state_size))
 
         print("New data, epoch", epoch_idx)
 
@@ -106,11 +116,11 @@ with tf.Session() as sess:
                 })
 
 
-            loss_list.append(_total_loss)
+            loss_tracker.add(_total_loss)
 
             if batch_idx%100 == 0:
-                print("Step",batch_idx, "Batch loss", _total_loss)
-                plot(loss_list, _predictions_series, batchX, batchY)
+                print("Step",batch_idx, "Batch loss", _total_loss, loss_tracker.summaryString())
+                plot(loss_tracker.history.values(), _predictions_series, batchX, batchY)
 
 plt.ioff()
 plt.show()
@@ -0,0 +1,24 @@
+from __future__ import print_function, division
+import numpy as np
+
+# builds the training data for the echo tasks: a sequence of classes, and the same sequence shifted by echo_step
+# time steps as the answers. both are fed as class indices, the graph expands the inputs to one hot itself and the
+# answers go to sparse_softmax_cross_entropy_with_logits, so the fed data is classes times smaller than one hot
+# the whole epoch is made from one index array, so there is no python loop over the time steps
+
+
+def randomClasses(length, classes, rng=None):
+    # rng is anything with randint, pass np.random.RandomState(seed) to get the same data every run
+    if rng is None:
+        rng = np.random
+    return rng.randint(0, classes, size=length)
+
+
+def echoData(classes, echo_step, batch_size, dtype=np.int32):
+    # classes: 1d int array, the class of every time step
+    # a positive echo_step makes the answer a past input, a negative one a future one (predicting)
+    # the answers wrap around at the ends, like np.roll
+    # returns (inputs [batch_size, length // batch_size], outputs [batch_size, length // batch_size]) of class indices
+    classes = np.asarray(classes, dtype=dtype)
+    answers = np.roll(classes, echo_step)
+    return classes.reshape((batch_size, -1)), answers.reshape((batch_size, -1))
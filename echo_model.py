@@ -0,0 +1,124 @@
+from __future__ import print_function, division
+import numpy as np
+import tensorflow as tf
+from rnn_layers import StackedRnn, projectSeries, ResidentState
+from dtype_policy import floatVariable, zeros
+
+# the stacked LSTM graph echo_3_fix and predict_0 train, with the entry points to train, evaluate and generate
+# the batch and time sizes of the placeholders are left open, so one graph (and one set of variables) does all three:
+# training on [batch_size, bpl] windows, evaluating a whole epoch in one run and generating one time step per run
+# stateful=True keeps the training state in a ResidentState of batch_size streams, so train() neither feeds nor fetches
+# it. evaluate and generate still feed their own state, init_state only defaults to the resident one
+
+
+class EchoModel(object):
+    def __init__(self, num_layers, state_size, input_classes, output_classes, learning_rate, stateful=False,
+                 batch_size=None, cell_backend="lstm"):
+        self.num_layers = num_layers
+        self.state_size = state_size
+        self.stateful = stateful
+
+        # input and output class indices [batch_size, bpl], the inputs are only expanded to one hot inside the graph
+        # and the answers go straight to sparse_softmax_cross_entropy_with_logits
+        self.batchX_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None])
+        self.batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None])
+        rnn_inputs = tf.one_hot(self.batchX_placeholder, input_classes)  # [batch_size, bpl, input_classes]
+
+        rnn = StackedRnn(cell_backend, state_size, num_layers)
+
+        # tuple size is 2
+        if stateful:
+            self.resident_state = ResidentState(rnn.zero_state(batch_size, tf.float32))
+            resident = tf.stack([tf.stack([state.c, state.h]) for state in self.resident_state.state])
+            self.init_state = tf.placeholder_with_default(resident, [num_layers, 2, None, state_size])
+        else:
+            self.init_state = tf.placeholder(tf.float32, [num_layers, 2, None, state_size])
+        layers = tf.unstack(self.init_state, axis=0)
+        rnn_tuple_state = tuple(
+                 [tf.nn.rnn_cell.LSTMStateTuple(layers[idx][0], layers[idx][1])
+                  for idx in range(num_layers)]
+        )
+
+        # used to compute the output given the state
+        self.output_weight = floatVariable(np.random.rand(state_size, output_classes))
+        self.output_bias = floatVariable(np.zeros(shape=(1, output_classes)))
+
+        # time_major=False just dictates the order of the shape of inputs
+        # states_series is a tensor of shape [batch_size, bpl, state_size]
+        states_series, self.current_state = rnn(rnn_inputs, initial_state=rnn_tuple_state, time_major=False)
+
+        # one matmul for every time step of every series at once, shape [batch_size, bpl, output_classes]
+        # LSTM: logits is the LSTM output ht, computed by tanh(state) * w2 + b
+        logits = projectSeries(states_series, self.output_weight, self.output_bias)
+
+        # softmax turns the output into probabilities instead of arbitrary values, so they sum to 1
+        self.predictions_series = tf.nn.softmax(logits)  # [batch_size, bpl, output_classes]
+
+        # compute how wrong the guess is by comparing the output(logits) to the correct output (labels)
+        # the logits are one value per class, but labels is just the index of the right class. That is what
+        # sparse_softmax_cross_entropy_with_logits does
+        # https://stackoverflow.com/questions/37312421/tensorflow-whats-the-difference-between-sparse-softmax-cross-entropy-with-logi
+        losses = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=logits, labels=self.batchY_placeholder)
+
+        # computes average value across all values in input_tensor
+        self.total_loss = tf.reduce_mean(input_tensor=losses)
+
+        # does backprop for us (corrects our tf variables so they are more accurate)
+        self.train_step = tf.train.AdagradOptimizer(learning_rate=learning_rate).minimize(self.total_loss)
+        if stateful:
+            # keeps the state for the next window
+            self.train_step = self.resident_state.update(self.current_state, after=[self.train_step])
+
+    def zeroState(self, batch):
+        # tuple size is 2
+        return zeros((self.num_layers, 2, batch, self.state_size))
+
+    def resetState(self, sess):
+        # stateful only: zeroes the resident state, at epoch boundaries
+        sess.run(self.resident_state.reset)
+
+    def train(self, sess, batchX, batchY, state=None):
+        # one training step on a batch of any size and length
+        # returns (loss, state after the batch, predictions [batch, time, output_classes])
+        # stateful: state is left out and comes back as None, the batch has to be [batch_size, bpl]
+        feed_dict = {
+            self.batchX_placeholder: batchX,  # input for this batch
+            self.batchY_placeholder: batchY,  # output (answers) for this batch
+        }
+        if self.stateful:
+            _total_loss, _train_step, _predictions_series = sess.run(
+                [self.total_loss, self.train_step, self.predictions_series], feed_dict=feed_dict)
+            return _total_loss, None, _predictions_series
+
+        feed_dict[self.init_state] = state
+        _total_loss, _train_step, _current_state, _predictions_series = sess.run(
+            [self.total_loss, self.train_step, self.current_state, self.predictions_series], feed_dict=feed_dict)
+        return _total_loss, _current_state, _predictions_series
+
+    def evaluate(self, sess, batchX, batchY, state):
+        # same as train without changing any weights
+        _total_loss, _current_state, _predictions_series = sess.run(
+            [self.total_loss, self.current_state, self.predictions_series],
+            feed_dict={
+                self.batchX_placeholder: batchX,
+                self.batchY_placeholder: batchY,
+                self.init_state: state
+            })
+        return _total_loss, _current_state, _predictions_series
+
+    def generate(self, sess, start_classes, num_steps):
+        # every stream is fed its start class and then its own most likely guess, one time step per run
+        # returns the guessed classes, shape [len(start_classes), num_steps]
+        classes = np.asarray(start_classes)
+        state = self.zeroState(len(classes))
+        generated = np.zeros((len(classes), num_steps), dtype=np.int64)
+        for i in range(num_steps):
+            _predictions_series, state = sess.run(
+                [self.predictions_series, self.current_state],
+                feed_dict={
+                    self.batchX_placeholder: classes[:, np.newaxis],  # [batch, 1]
+                    self.init_state: state
+                })
+            classes = np.argmax(_predictions_series[:, 0], axis=1)
+            generated[:, i] = classes
+        return generated
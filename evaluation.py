@@ -0,0 +1,62 @@
+from __future__ import print_function, division
+from multiprocessing.pool import ThreadPool
+import numpy as np
+import tensorflow as tf
+
+# evaluates a whole split (a test set) chunk_size examples at a time instead of feeding all of it in one run, so the
+# memory used (the fed arrays and every activation of the graph) depends on chunk_size and not on the size of the split
+# the graph gives sums over a chunk (like correctCount, or a loss that is reduce_sum'd instead of reduce_mean'd), they
+# are added up in numpy and divided by the number of examples at the end, so the result is the same as one big run
+# num_threads > 1 runs that many chunks at the same time on a thread pool, sess.run lets go of the GIL so the chunks
+# really do run together, and making a chunk's data in numpy overlaps with the runs of the others. the memory used is
+# then num_threads chunks
+
+
+def correctCount(predictions, labels):
+    # how many of the chunk's one hot labels have their class picked by predictions (logits or probabilities)
+    correct = tf.equal(tf.argmax(predictions, 1), tf.argmax(labels, 1))
+    return tf.reduce_sum(tf.cast(correct, tf.float32))
+
+
+class ChunkedEvaluator(object):
+    def __init__(self, sess, sums, chunk_size=1000, num_threads=1):
+        # sums: dict of name to a scalar tensor that sums something over the examples of a chunk
+        self.sess = sess
+        self.names = sorted(sums.keys())
+        self.fetches = [sums[name] for name in self.names]
+        self.chunk_size = chunk_size
+        self.num_threads = num_threads
+
+    def evaluate(self, makeFeed, num_examples):
+        # makeFeed(start, stop) returns the feed_dict for examples [start, stop), it's only called when that chunk is
+        # about to run, so the split never has to exist all at once
+        # returns a dict of name to the sum divided by num_examples (the mean per example)
+        def runChunk(start):
+            stop = min(start + self.chunk_size, num_examples)
+            return self.sess.run(self.fetches, feed_dict=makeFeed(start, stop))
+
+        starts = range(0, num_examples, self.chunk_size)
+        totals = np.zeros(len(self.fetches))
+        if self.num_threads > 1:
+            pool = ThreadPool(self.num_threads)
+            try:
+                for chunk_sums in pool.imap_unordered(runChunk, starts):
+                    totals += chunk_sums
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for start in starts:
+                totals += runChunk(start)
+
+        return dict((name, float(total) / max(num_examples, 1)) for name, total in zip(self.names, totals))
+
+    def evaluateArrays(self, placeholders, arrays):
+        # for splits that are already in memory, like mnist.test: placeholders and arrays are lists in the same order,
+        # every chunk feeds slices (views, not copies) of the arrays
+        num_examples = len(arrays[0])
+
+        def makeFeed(start, stop):
+            return dict((placeholder, array[start:stop]) for placeholder, array in zip(placeholders, arrays))
+
+        return self.evaluate(makeFeed, num_examples)
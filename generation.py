@@ -0,0 +1,47 @@
+from __future__ import print_function, division
+import tensorflow as tf
+
+# builds text generation into the graph so a whole sample comes back from a single sess.run
+# the loop feeds each picked class straight back in as the next input, so neither the state nor the inputs ever
+# have to leave the session between characters
+# every row of the batch is its own stream with its own prompt and temperature, so the matmuls are shared by all
+
+
+def buildGenerator(cell, output_weight, output_bias, input_classes, temperature=1.0):
+    # cell has to be the same cell the training graph was built with, calling it again reuses its variables
+    # returns (prompts, temperatures, num_chars, generated)
+    # prompts: int32 placeholder [gen_batch_size, prompt_length], every stream is fed its prompt before generating
+    #   on its own, a prompt of length 1 is just the start class. all prompts in a batch have the same length
+    # temperatures: float32 [gen_batch_size], defaults to temperature for every stream if it isn't fed
+    # num_chars: int32 placeholder, how many characters to generate for every stream
+    # generated: int32 tensor [gen_batch_size, num_chars] of picked class indices, not including the prompts
+    prompts = tf.placeholder(dtype=tf.int32, shape=[None, None])
+    num_chars = tf.placeholder(dtype=tf.int32, shape=[])
+
+    gen_batch_size = tf.shape(prompts)[0]
+    prompt_length = tf.shape(prompts)[1]
+    temperatures = tf.placeholder_with_default(tf.fill([gen_batch_size], float(temperature)), shape=[None])
+
+    # the pick made on the last prompt character is the first generated one
+    num_steps = prompt_length - 1 + num_chars
+    generated = tf.TensorArray(dtype=tf.int32, size=num_steps)
+
+    def keepGoing(i, last_classes, state, generated):
+        return i < num_steps
+
+    def generateChar(i, last_classes, state, generated):
+        # while we're still inside the prompt, feed it instead of what was picked
+        inputs = tf.cond(i < prompt_length, lambda: prompts[:, i], lambda: last_classes)
+        output, state = cell(tf.one_hot(inputs, input_classes), state)
+        logits = tf.matmul(output, output_weight) + output_bias
+        # multinomial takes unnormalized log probabilities, so dividing the logits is the same as the softmax version
+        picks = tf.multinomial(logits=logits / tf.expand_dims(temperatures, 1), num_samples=1)
+        picks = tf.cast(picks[:, 0], tf.int32)
+        return i + 1, picks, state, generated.write(i, picks)
+
+    loop_vars = [tf.constant(0), prompts[:, 0], cell.zero_state(gen_batch_size, tf.float32), generated]
+    _, _, _, generated = tf.while_loop(cond=keepGoing, body=generateChar, loop_vars=loop_vars)
+
+    generated = tf.transpose(generated.stack(), [1, 0])  # stack is [num_steps, gen_batch_size]
+    generated = generated[:, prompt_length - 1:]
+    return prompts, temperatures, num_chars, generated
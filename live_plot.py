@@ -0,0 +1,123 @@
+from __future__ import print_function, division
+import multiprocessing
+import numpy as np
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+# draws the loss and a few guessed series in a window while a script trains, like the plot() functions used to
+# the drawing happens in its own process, the training loop only hands it the new (already averaged) losses and the
+# classes of the series to draw, and never waits for it. if the plot is still busy drawing the last update, the
+# series are dropped and the losses are sent along with the next one
+# headless=True never imports matplotlib and doesn't start the process, for training without a display
+
+
+class LivePlot(object):
+    def __init__(self, bpl, classes, headless=False, max_points=2000, num_series=5):
+        # bpl: how long the series are, classes: how many classes there are (for the bar heights)
+        # max_points: the loss history is shrunk (neighbours averaged) whenever it grows past this, so the whole run
+        #   is always shown and the plotting process never uses more memory than that
+        self.headless = headless
+        self.num_series = num_series
+        self.pending_losses = []
+        if headless:
+            return
+
+        try:
+            # fork, the scripts have no main guard, so a spawned process would run the whole script again
+            context = multiprocessing.get_context("fork")
+        except AttributeError:  # python 2 only forks
+            context = multiprocessing
+        self.updates = context.Queue(maxsize=1)
+        self.process = context.Process(target=plotLoop, args=(self.updates, bpl, classes, max_points, num_series))
+        self.process.daemon = True
+        self.process.start()
+
+    def addLoss(self, loss):
+        if not self.headless:
+            self.pending_losses.append(float(loss))
+
+    def update(self, inputs, answers, guesses):
+        # inputs, answers, guesses: class arrays of shape [batch_size, bpl], only the first num_series are sent
+        if self.headless:
+            return
+        if not self.process.is_alive():  # the window was closed or matplotlib failed, keep training without it
+            print("Plot process stopped, continuing without the plot")
+            self.headless = True
+            self.pending_losses = []
+            return
+        series = [np.asarray(classes[:self.num_series], dtype=np.int32) for classes in [inputs, answers, guesses]]
+        try:
+            self.updates.put_nowait((self.pending_losses, series))
+            self.pending_losses = []
+        except queue.Full:
+            pass  # still drawing, the losses stay pending
+
+    def close(self):
+        # leaves the window open until it's closed, like plt.ioff(), plt.show() at the end of the scripts did
+        if self.headless:
+            return
+        while self.process.is_alive():
+            try:
+                self.updates.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                pass  # still drawing the last update
+        self.process.join()
+
+
+def plotLoop(updates, bpl, classes, max_points, num_series):
+    import matplotlib.pyplot as plt
+
+    plt.ion()
+    plt.figure()
+    plt.show()
+
+    loss_list = []
+    step_list = []  # which loss of the run every point is (the middle of the ones averaged into it)
+    num_losses = 0
+    while True:
+        try:
+            update = updates.get(timeout=0.1)
+        except queue.Empty:
+            plt.pause(0.05)  # keeps the window responsive between updates
+            continue
+        if update is None:
+            break
+
+        losses, (inputs, answers, guesses) = update
+        loss_list.extend(losses)
+        step_list.extend(range(num_losses, num_losses + len(losses)))
+        num_losses += len(losses)
+        if len(loss_list) > max_points:
+            # the steps are averaged the same way, so the older points stay where they were on the x axis
+            paired = len(loss_list) // 2 * 2
+            loss_list = list(np.mean(np.reshape(loss_list[:paired], (-1, 2)), axis=1)) + loss_list[paired:]
+            step_list = list(np.mean(np.reshape(step_list[:paired], (-1, 2)), axis=1)) + step_list[paired:]
+
+        ax = plt.subplot(2, 3, 1)
+        plt.cla()
+        plt.plot(step_list, loss_list)
+        ax.set_ylim(ymin=0)  # always show y0
+
+        bar_height = 0.1
+        next_bars = bar_height * classes
+        left_offset = range(bpl)
+        for series_i in range(min(num_series, len(guesses))):
+            plt.subplot(2, 3, series_i + 2)  # select the next plot to draw on
+            plt.cla()
+            plt.axis([0, bpl, 0, 2])
+            plt.bar(x=left_offset, height=inputs[series_i] * bar_height, bottom=next_bars * 2, width=1,
+                    color="red")  # input
+            plt.bar(x=left_offset, height=answers[series_i] * bar_height, bottom=next_bars * 1, width=1,
+                    color="green")  # output
+            plt.bar(x=left_offset, height=guesses[series_i] * bar_height, bottom=next_bars * 0, width=1,
+                    color="blue")  # network guess
+
+        plt.draw()
+        plt.pause(0.0001)
+
+    plt.ioff()
+    plt.show()
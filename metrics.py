@@ -0,0 +1,93 @@
+from __future__ import print_function, division
+import numpy as np
+
+# keeps track of the training loss in a fixed amount of memory, no matter how many steps a run takes
+# the losses go into ring buffers (the newest overwrite the oldest) and the running values (moving average, min, max)
+# are updated as they come in, so a summary can be asked for at any step without going over the whole run
+
+
+class RingBuffer(object):
+    def __init__(self, capacity, dtype=np.float64):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.count = 0  # how many values were ever appended
+
+    def append(self, value):
+        self.data[self.count % self.capacity] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def last(self):
+        # None before anything was appended
+        if self.count == 0:
+            return None
+        return self.data[(self.count - 1) % self.capacity]
+
+    def values(self):
+        # a copy of what is kept, oldest first
+        if self.count <= self.capacity:
+            return self.data[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate([self.data[start:], self.data[:start]])
+
+
+class LossTracker(object):
+    def __init__(self, capacity=2000, average_over=20, ema_decay=0.98):
+        # capacity: how many recent losses, and how many averages of average_over losses, are kept
+        # average_over: how many losses go into every point of history, averaging takes out the spikes for plotting
+        # ema_decay: how much of the moving average is kept on every step, 0.98 is roughly the last 50 steps
+        self.recent = RingBuffer(capacity)
+        self.history = RingBuffer(capacity)
+        self.average_over = average_over
+        self.ema_decay = ema_decay
+
+        self.steps = 0
+        self.ema = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.block_total = 0.0
+
+    def add(self, loss):
+        # returns the average when this loss finishes a block of average_over losses, None otherwise
+        loss = float(loss)
+        self.recent.append(loss)
+        self.ema = loss if self.steps == 0 else self.ema_decay * self.ema + (1 - self.ema_decay) * loss
+        self.minimum = min(self.minimum, loss)
+        self.maximum = max(self.maximum, loss)
+        self.steps += 1
+
+        self.block_total += loss
+        if self.steps % self.average_over != 0:
+            return None
+        average = self.block_total / self.average_over
+        self.block_total = 0.0
+        self.history.append(average)
+        return average
+
+    def percentile(self, q):
+        # q (0 to 100) percentile of the recent losses, None before the first add
+        if self.steps == 0:
+            return None
+        return np.percentile(self.recent.values(), q)
+
+    def summary(self):
+        # before the first add every value but steps is None
+        if self.steps == 0:
+            return {"steps": 0, "last": None, "ema": None, "min": None, "max": None, "median": None, "p90": None}
+        recent = self.recent.values()
+        return {
+            "steps": self.steps,
+            "last": self.recent.last(),
+            "ema": self.ema,
+            "min": self.minimum,
+            "max": self.maximum,
+            "median": np.percentile(recent, 50),
+            "p90": np.percentile(recent, 90),
+        }
+
+    def summaryString(self):
+        if self.steps == 0:
+            return "no losses yet"
+        return "ema {ema:.4f} min {min:.4f} max {max:.4f} median {median:.4f} p90 {p90:.4f}".format(**self.summary())
@@ -3,12 +3,15 @@ from __future__ import print_function
 import tensorflow as tf
 import numpy as np
 from tensorflow.examples.tutorials.mnist import input_data
+from evaluation import ChunkedEvaluator, correctCount
 mnist = input_data.read_data_sets("/tmp/data/", one_hot=True)
 
 # Parameters
 learning_rate = 0.2
 training_epochs = 15
 batch_size = 100
+eval_chunk_size = 1000  # the test set is evaluated this many images at a time
+eval_threads = 2
 
 num_labels = 10
 num_inputs = 784
@@ -71,13 +74,17 @@ with tf.Session() as sess:
 
     # Test model
     pred = tf.nn.softmax(fullNetwork)  # Apply softmax to logits
-    correct_prediction = tf.equal(tf.argmax(pred, 1), tf.argmax(networkOutput, 1))
-
-    accuracy = tf.reduce_mean(tf.cast(correct_prediction, "float"))
+    # sums over a chunk of the test set, the evaluator adds them up over all of it
+    test_sums = {
+        "accuracy": correctCount(pred, networkOutput),
+        "cost": tf.reduce_sum(tf.nn.softmax_cross_entropy_with_logits(logits=fullNetwork, labels=networkOutput)),
+    }
+    evaluator = ChunkedEvaluator(sess, test_sums, eval_chunk_size, eval_threads)
 
     #first = mnist.test.images[:100]
     #reshape = np.reshape(first, [100, 28, 28, 1])
-    print("Accuracy:", accuracy.eval({networkInput: mnist.test.images, networkOutput: mnist.test.labels}))
+    test_results = evaluator.evaluateArrays([networkInput, networkOutput], [mnist.test.images, mnist.test.labels])
+    print("Accuracy:", test_results["accuracy"], "Cost = {:.5f}".format(test_results["cost"]))
 
     writer.close()
 
@@ -0,0 +1,239 @@
+from __future__ import print_function, division
+import re
+import sys
+import time
+import numpy as np
+from checkpoint_reader import CheckpointReader, isOptimizerSlot
+from sampling import sample
+from char_codec import num_classes, indicesToString
+
+# runs the stacked LSTMs the predict_2 scripts train straight from their saved brains, without building a tensorflow
+# graph or session, so sampling text starts right away
+# the math is tf.nn.rnn_cell.LSTMCell's (no peepholes or projection, forget_bias 1.0): for every layer
+#   i, j, f, o = split([inputs, h] * kernel + bias, 4)
+#   c = sigmoid(f + forget_bias) * c + sigmoid(i) * tanh(j)
+#   h = sigmoid(o) * tanh(c)
+# and the logits are h of the top layer * output_weight + output_bias
+# dropout is left out, so this matches the tensorflow graph with keep_prob 1
+#   python numpy_lstm.py brain/predict_2_dropout_2layer/model_layers_2_state_512.ckpt [num_chars]
+#   add --check to compare the logits against tensorflow's LSTMCell instead (needs tensorflow)
+
+gen_batch_size = 16  # how many streams to generate at once
+gen_num_chars = 2000
+temperature = 1.0
+
+
+def sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1)  # same as 1 / (1 + exp(-x)) without overflowing for big negative x
+
+
+class NumpyLstm(object):
+    def __init__(self, brain_path, num_layers=None, forget_bias=1.0, weight_name=None, bias_name=None):
+        # brain_path: the checkpoint prefix the script saved to, like brain/predict_2/model_layers_2_state_512.ckpt
+        # num_layers: only needed when the checkpoint has fewer cells than the model had layers, which happens when
+        #   an older script built its layers as [cell] * num_layers and so shared one cell. the name has the count in it
+        # weight_name, bias_name: the output layer's variables, found by findOutputLayer when they're left out
+        reader = CheckpointReader(brain_path)
+        self.forget_bias = forget_bias
+
+        # the layers are named .../cell_0/..., .../cell_1/... inside a MultiRNNCell, or just .../kernel for a single one
+        kernels = sorted([name for name in reader.names() if name.endswith("/kernel")], key=layerNumber)
+        if len(kernels) == 0:
+            raise ValueError(brain_path + " doesn't have any LSTM kernels")
+        if num_layers is None:
+            num_layers = layersInName(brain_path, len(kernels))
+        if len(kernels) != num_layers and len(kernels) != 1:
+            raise ValueError(brain_path + " has " + str(len(kernels)) + " cells, which doesn't fit " + str(num_layers) +
+                             " layers")
+
+        biases = [name[:-len("kernel")] + "bias" for name in kernels]
+        for name in biases:
+            if name not in reader.entries:
+                raise ValueError(brain_path + " has no " + name + " next to its kernel, it has: " + listNames(reader))
+        cell_kernels = [reader.tensor(name) for name in kernels]
+        cell_biases = [reader.tensor(name) for name in biases]
+        if len(kernels) != num_layers:  # one cell shared by all the layers
+            cell_kernels *= num_layers
+            cell_biases *= num_layers
+
+        if weight_name is None or bias_name is None:
+            weight_name, bias_name = findOutputLayer(reader, cell_biases[0].shape[0] // 4)
+        self.setWeights(cell_kernels, cell_biases, reader.tensor(weight_name), reader.tensor(bias_name))
+
+    def setWeights(self, kernels, biases, output_weight, output_bias):
+        # kernels, biases: one per layer, a layer that shares its cell with another one gets the same arrays
+        self.kernels = kernels
+        self.biases = biases
+        self.num_layers = len(kernels)
+        self.state_size = self.biases[0].shape[0] // 4
+        self.input_classes = self.kernels[0].shape[0] - self.state_size
+
+        # the first layer's input is one hot, so its part of the kernel is just looked up by class instead of multiplied
+        self.input_rows = self.kernels[0][:self.input_classes]
+        self.recurrent_kernel = self.kernels[0][self.input_classes:]
+
+        self.output_weight = output_weight
+        self.output_bias = output_bias
+        self.output_classes = self.output_weight.shape[1]
+
+    def zeroState(self, batch_size):
+        # one (c, h) per layer, like the LSTMStateTuples of the tensorflow version
+        return [(np.zeros((batch_size, self.state_size), np.float32), np.zeros((batch_size, self.state_size), np.float32))
+                for _ in range(self.num_layers)]
+
+    def step(self, classes, state):
+        # classes: int array [batch_size] of the input class of every stream
+        # returns (logits [batch_size, output_classes], new state)
+        new_state = []
+        inputs = None
+        for i in range(self.num_layers):
+            c, h = state[i]
+            if i == 0:
+                gates = self.input_rows[classes] + np.dot(h, self.recurrent_kernel)
+            else:
+                gates = np.dot(np.concatenate([inputs, h], axis=1), self.kernels[i])
+            gates += self.biases[i]
+
+            in_gate, new_input, forget_gate, out_gate = np.split(gates, 4, axis=1)
+            c = sigmoid(forget_gate + self.forget_bias) * c + sigmoid(in_gate) * np.tanh(new_input)
+            h = sigmoid(out_gate) * np.tanh(c)
+            new_state.append((c, h))
+            inputs = h
+
+        return np.dot(inputs, self.output_weight) + self.output_bias, new_state
+
+    def generate(self, prompts, num_chars, temperatures=1.0, rng=None):
+        # same as generation.buildGenerator: every row of prompts is its own stream, fed its prompt before it
+        # generates on its own. temperatures is one value or one per stream
+        # returns an int array [batch_size, num_chars] of picked classes, not including the prompts
+        prompts = np.array(prompts, dtype=np.int64, ndmin=2)
+        temperatures = np.reshape(np.asarray(temperatures, dtype=np.float32), (-1, 1))
+        state = self.zeroState(len(prompts))
+        generated = np.zeros((len(prompts), num_chars), dtype=np.int64)
+
+        for i in range(prompts.shape[1] - 1):
+            _, state = self.step(prompts[:, i], state)
+
+        picks = prompts[:, -1]
+        for i in range(num_chars):
+            logits, state = self.step(picks, state)
+            picks = sample(softmax(logits / temperatures), rng)
+            generated[:, i] = picks
+        return generated
+
+
+def crossEntropy(lstm, indices, num_streams=64, max_chars=0):
+    # average cross entropy (in nats) of predicting every next character of indices, a 1d array of classes
+    # the text is cut into num_streams contiguous streams like text_streams.StreamBatcher does, so they can be stepped
+    # together, and every stream carries its state from its first character to its last
+    # max_chars: only look at the start of the text, 0 uses all of it
+    if max_chars:
+        indices = indices[:max_chars + 1]
+    length = (len(indices) - 1) // num_streams
+    used = num_streams * length
+    inputs = np.asarray(indices[:used]).reshape((num_streams, length))
+    targets = np.asarray(indices[1:used + 1]).reshape((num_streams, length))
+
+    state = lstm.zeroState(num_streams)
+    total = 0.0
+    rows = np.arange(num_streams)
+    for i in range(length):
+        logits, state = lstm.step(inputs[:, i], state)
+        # log softmax of the right answers, shifted by the max so exp can't overflow
+        top = np.max(logits, axis=1)
+        log_totals = top + np.log(np.sum(np.exp(logits - top[:, np.newaxis]), axis=1))
+        total += np.sum(log_totals - logits[rows, targets[:, i]])
+    return total / used
+
+
+def softmax(logits):
+    exps = np.exp(logits - np.max(logits, axis=1, keepdims=True))
+    return exps / np.sum(exps, axis=1, keepdims=True)
+
+
+def findOutputLayer(reader, state_size):
+    # returns the (weight, bias) names of the output layer
+    # the scripts make it with unnamed variables, so it's Variable, Variable_1, ... numbered by the order the script
+    # made its variables in. it's found by shape instead of by those numbers: the only [state_size, classes] variable
+    # outside the cells, and the only [1, classes] or [classes] one
+    others = [name for name in reader.names()
+              if not isOptimizerSlot(name) and not name.endswith("/kernel") and not name.endswith("/bias")]
+    weights = [name for name in others if len(reader.shape(name)) == 2 and reader.shape(name)[0] == state_size]
+    if len(weights) == 1:
+        classes = reader.shape(weights[0])[1]
+        biases = [name for name in others if list(reader.shape(name)) in [[1, classes], [classes]]]
+        if len(biases) == 1:
+            return weights[0], biases[0]
+    raise ValueError(reader.prefix + " has no single output layer for state size " + str(state_size) +
+                     ", pass weight_name and bias_name. It has: " + listNames(reader))
+
+
+def listNames(reader):
+    return ", ".join(name + " " + str(list(reader.shape(name))) for name in reader.names()
+                     if not isOptimizerSlot(name))
+
+
+def layerNumber(name):
+    found = re.search(r"/cell_(\d+)/", name)
+    return int(found.group(1)) if found else 0
+
+
+def layersInName(brain_path, default):
+    # the scripts put "layers_2" in the brain name
+    found = re.search(r"layers_(\d+)", brain_path)
+    return int(found.group(1)) if found else default
+
+
+def checkAgainstTensorflow(lstm, prompts):
+    # builds the same cells in tensorflow, loads them with the same values and compares the logits after every input
+    import tensorflow as tf
+
+    inputs = tf.one_hot(tf.constant(prompts), lstm.input_classes)
+    cells = [tf.nn.rnn_cell.LSTMCell(lstm.state_size, state_is_tuple=True) for _ in range(lstm.num_layers)]
+    states_series, _ = tf.nn.dynamic_rnn(cell=tf.nn.rnn_cell.MultiRNNCell(cells, state_is_tuple=True), inputs=inputs,
+                                         dtype=tf.float32)
+    logits = tf.tensordot(states_series, lstm.output_weight, axes=1) + lstm.output_bias
+
+    loads = []
+    for i in range(lstm.num_layers):
+        loads.append(tf.assign(cells[i].weights[0], lstm.kernels[i]))
+        loads.append(tf.assign(cells[i].weights[1], lstm.biases[i]))
+
+    with tf.Session() as sess:
+        sess.run(loads)
+        tf_logits = sess.run(logits)
+
+    state = lstm.zeroState(len(prompts))
+    worst = 0.0
+    for i in range(prompts.shape[1]):
+        np_logits, state = lstm.step(prompts[:, i], state)
+        worst = max(worst, np.max(np.abs(np_logits - tf_logits[:, i])))
+    return worst
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    brain_path = args[0]
+    num_chars = int(args[1]) if len(args) > 1 else gen_num_chars
+
+    start = time.time()
+    lstm = NumpyLstm(brain_path)
+    print("Loaded", lstm.num_layers, "layers of", lstm.state_size, "in", time.time() - start, "seconds")
+
+    if "--check" in sys.argv:
+        prompts = np.random.randint(0, min(num_classes, lstm.input_classes), (4, 100))
+        print("Largest difference from tensorflow:", checkAgainstTensorflow(lstm, prompts))
+        return
+
+    # every stream starts from its own random class, like writeSamples in char_model.py
+    prompts = np.random.randint(0, min(num_classes, lstm.input_classes), (gen_batch_size, 1))
+    start = time.time()
+    generated = lstm.generate(prompts, num_chars, temperature)
+    print("Generated", generated.size, "chars in", time.time() - start, "seconds")
+
+    for stream in range(gen_batch_size):
+        print(indicesToString(generated[stream]))
+
+
+if __name__ == "__main__":
+    main()
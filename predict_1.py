@@ -2,23 +2,11 @@ from __future__ import print_function, division
 import numpy as np
 import tensorflow as tf
 import matplotlib.pyplot as plt
-
-# returns index value
-def rand_pick(values, trim=0):
-
-    if trim != 0: # trim some values off
-        values = [0 if value < trim else value for value in values]
-
-    rand = np.random.random() * np.sum(values)
-
-    prob = 0
-    for i in range(len(values)):
-        prob += values[i]
-        if rand <= prob:
-            return i
-
-    return len(values)-1 # if the value happens to be just higher than last prob, handle that
-
+from background import BatchPrefetcher
+from metrics import LossTracker
+from sampling import sample
+from rnn_layers import StackedRnn
+from dtype_policy import floatVariable, zeros
 
 echo_step = -1  # by how many time steps is the input shifted to produce the output (we want to predict so we )
 num_epochs = 2  # how many epochs of training should we do?
@@ -29,8 +17,10 @@ output_classes = state_size  # defines OUTPUT vector length
 batch_size = 5  # how many series to process simultaneously. provides smoother training
 batches_per_epoch = epoch_input_length // batch_size // bpl  # how many batches to do before starting a new epoch
 # because we are out of data
+num_loss_avg = 20  # average accross this many losses for the plot to prevent spikes
 learning_rate = 0.1  # how fast we try to learn (this value is important)
 num_layers = 2  # how many layers of the cell type do we stack?
+cell_backend = "lstm"  # which cell to stack, see rnn_layers.py. "block" and "fused" are faster on CPU
 input_classes = state_size  # read this link
 # https://stackoverflow.com/questions/47371608/cannot-stack-lstm-with-multirnncell-and-dynamic-rnn/47376568#47376568
 output_classes_real = 8  # lets us trim off the classes that aren't used from the data generation and display
@@ -38,47 +28,23 @@ temperature = 1.0 # outputs are divided by temperature, so 0.5 turns 2,1 into 4,
 # but softmax cares about the linear difference between values, so 0.5 increases confidence since (4-2) > (2-1)
 # higher temperature makes the difference between values less, so it makes it more random and creative
 
-batchX = np.zeros((1, 1, input_classes))
-batchY = np.zeros((1, 1, input_classes))
-
-batchX[0,0,1] = 1  # start the sequence
-
-def generateRandomClassVector():
-    vector = np.zeros(input_classes)
-    vector[np.random.randint(0, output_classes)] = 1
-    return vector
-
-
-def generateClassVector(i):
-    vector = np.zeros(input_classes)
-    vector[i] = 1
-    return vector
-
-
 def generateData():
-    inputs = np.empty((epoch_input_length, input_classes))
-    for i in range(epoch_input_length):
-        v = generateClassVector(i % output_classes_real)
-        inputs[i] = v
-
+    inputs = np.arange(epoch_input_length, dtype=np.int32) % output_classes_real  # class indices 0 1 2 .. 7 0 1 ..
 
-    outputs = []
-    for i in range(len(inputs)):
-        outputs.append(inputs[i])
-
-    outputs = np.roll(a=outputs, shift=echo_step, axis=0)  # just shifts the whole bit list over by echo_step
+    outputs = np.roll(a=inputs, shift=echo_step, axis=0)  # just shifts the whole bit list over by echo_step
 
     # reshape this into a 2d vector where each entry has batch_size elements and an unknown (-1) number of entries in it
-    inputs = inputs.reshape((batch_size, -1, input_classes))
-    outputs = outputs.reshape((batch_size, -1, output_classes))
+    inputs = inputs.reshape((batch_size, -1))
+    outputs = outputs.reshape((batch_size, -1))
 
     return inputs, outputs  # have shapes[batch_size, (remainder)] in this case, [5, 10000]
 
 
-# input, output, and state types [batch_size, bpl, input_classes]
+# input and output class indices [batch_size, bpl], the inputs are only expanded to one hot inside the graph
 # keeping the values as None lets it be dynamic so we can do 1 char at a time later!
-batchX_placeholder = tf.placeholder(dtype=tf.float32, shape=[None, None, input_classes])
-batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None, output_classes])
+batchX_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None])
+batchY_placeholder = tf.placeholder(dtype=tf.int32, shape=[None, None])
+inputs = tf.one_hot(batchX_placeholder, input_classes)  # [batch_size, bpl, input_classes]
 
 # tuple size is 2
 init_state = tf.placeholder(tf.float32, [num_layers, 2, None, state_size])
@@ -89,23 +55,22 @@ rnn_tuple_state = tuple(
 )
 
 # these are necessary, otherwise you have no way of converting state to
-output_weight = tf.Variable(np.random.rand(state_size, output_classes), dtype=tf.float32)
-output_bias = tf.Variable(np.zeros(shape=(1, output_classes)), dtype=tf.float32)
+output_weight = floatVariable(np.random.rand(state_size, output_classes))
+output_bias = floatVariable(np.zeros(shape=(1, output_classes)))
 
 
-cell = tf.nn.rnn_cell.LSTMCell(state_size, state_is_tuple=True)
-cell = tf.nn.rnn_cell.MultiRNNCell([cell] * num_layers, state_is_tuple=True)
-states_series, current_state = tf.nn.dynamic_rnn(cell=cell, inputs=batchX_placeholder, initial_state=rnn_tuple_state, time_major=False)
+rnn = StackedRnn(cell_backend, state_size, num_layers)
+states_series, current_state = rnn(inputs, initial_state=rnn_tuple_state, time_major=False)
 
 states_series = tf.reshape(states_series, [-1, state_size])
 logits = tf.matmul(states_series, output_weight) + output_bias  # logits = 150, 50
-labels = batchY_placeholder
+labels = tf.reshape(batchY_placeholder, [-1])  # lines up with the logits rows
 
 
 predictions_series = tf.nn.softmax(tf.scalar_mul(scalar=float(1)/float(temperature), x=logits))
 
 
-losses = tf.nn.softmax_cross_entropy_with_logits(logits=logits, labels=labels)
+losses = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=logits, labels=labels)
 total_loss = tf.reduce_mean(input_tensor=losses)
 train_step = tf.train.AdagradOptimizer(learning_rate=learning_rate).minimize(total_loss)
 
@@ -140,10 +105,10 @@ def plot(loss_list, predictions_series, batchX, batchY):
 
         print()
 
-        plt.bar(x=left_offset, height=decode(batchX[batch_series_idx, :]) * barHeight, bottom=nextBars * 2, width=1,
+        plt.bar(x=left_offset, height=batchX[batch_series_idx, :] * barHeight, bottom=nextBars * 2, width=1,
                 color="red")  # input
 
-        plt.bar(x=left_offset, height=decode(batchY[batch_series_idx, :]) * barHeight, bottom=nextBars * 1, width=1,
+        plt.bar(x=left_offset, height=batchY[batch_series_idx, :] * barHeight, bottom=nextBars * 1, width=1,
                 color="green")  # output
 
         plt.bar(x=left_offset, height=single_output_series * barHeight, bottom=nextBars * 0, width=1,
@@ -153,6 +118,9 @@ def plot(loss_list, predictions_series, batchX, batchY):
     plt.pause(0.0001)
 
 
+# builds the next epochs of data on another thread while the current one trains
+epoch_data = BatchPrefetcher(generateData, depth=2)
+
 np.set_printoptions(precision=1)
 with tf.Session() as sess:
     sess.run(tf.global_variables_initializer())
@@ -160,16 +128,15 @@ with tf.Session() as sess:
     plt.ion()
     plt.figure()
     plt.show()
-    loss_list = []
+    loss_tracker = LossTracker(average_over=num_loss_avg)  # keeps the loss history in constant memory
 
     for epoch in range(num_epochs):
-        x, y = generateData()
+        x, y = epoch_data.get()
         # tuple size is 2
-        _current_state = np.zeros((num_layers, 2, batch_size, state_size))
+        _current_state = zeros((num_layers, 2, batch_size, state_size))
 
         print("New data, epoch:", epoch)
 
-        sub_loss_list = []  # store the loss value because displaying every single one is silly
         for batch_i in range(batches_per_epoch):
             # find where in the data to start for this batch
             start_batch_pos = batch_i * bpl
@@ -193,19 +160,13 @@ with tf.Session() as sess:
 
 
             # keep track of the loss values so we can plot them
-            sub_loss_list.append(_total_loss)
-            num_loss_avg = 20  # average accross this many to prevent spikes
-            if (len(sub_loss_list) >= num_loss_avg):
-                averageValue = [np.average(sub_loss_list)]
-                averageValue = averageValue * num_loss_avg  # repeat this value num_loss_avg times
-                sub_loss_list = []
-                loss_list.extend(averageValue)
+            loss_tracker.add(_total_loss)
 
 
             if batch_i % 100 == 0:
-                print("Step:", batch_i, "Loss:", _total_loss)
+                print("Step:", batch_i, "Loss:", _total_loss, loss_tracker.summaryString())
                 # update the plots
-                #plot(loss_list, _predictions_series, batchX, batchY)
+                #plot(loss_tracker.history.values(), _predictions_series, batchX, batchY)
 
                 if batch_i % 400 == 0:
                     mini_batch_prediction = []
@@ -213,8 +174,8 @@ with tf.Session() as sess:
                     batch_series_i = 2
 
                     _predictions_series = np.reshape(a=_predictions_series, newshape=[batch_size, bpl, output_classes])
-                    rounded_input = decode(batchX[batch_series_i, :])
-                    rounded_answer = decode(batchY[batch_series_i, :])
+                    rounded_input = batchX[batch_series_i, :]
+                    rounded_answer = batchY[batch_series_i, :]
                     rounded_prediction = decode(_predictions_series[batch_series_i, :])
 
                     print("Input:")
@@ -238,11 +199,9 @@ with tf.Session() as sess:
     gen_bpl = 1
     gen_num_batches = 20
 
-    _current_state = np.zeros((num_layers, 2, gen_batch_size, state_size))
-    batchX = np.zeros((gen_batch_size, gen_bpl, input_classes))
-    batchY = np.zeros((gen_batch_size, gen_bpl, input_classes))
-
-    batchX[0,0,1] = 1  # start the sequence
+    _current_state = zeros((num_layers, 2, gen_batch_size, state_size))
+    batchX = np.ones((gen_batch_size, gen_bpl), dtype=np.int32)  # start the sequence with class 1
+    batchY = np.zeros((gen_batch_size, gen_bpl), dtype=np.int32)
 
     for i in range(gen_num_batches):
 
@@ -255,17 +214,14 @@ with tf.Session() as sess:
             })
 
         _predictions_series = np.reshape(a=_predictions_series, newshape=[gen_batch_size, gen_bpl, output_classes])
-        rounded_input = decode(batchX[0, :])
-        rounded_answer = decode(batchY[0, :])
+        rounded_input = batchX[0, :]
+        rounded_answer = batchY[0, :]
         rounded_prediction = decode(_predictions_series[0, :])
 
 
-        x = rand_pick(values=_predictions_series[0, :][0],trim=0)  # accessing 0 batch at end
-
-        _predictions_series[0, :][0] = np.zeros(input_classes)
-        _predictions_series[0, :][0][x] = 1
+        x = sample(_predictions_series[:, -1], trim=0)[0]  # accessing 0 batch at end
 
-        batchX[0, :] = _predictions_series[0, :]  # set the new input to be the last output
+        batchX[0, :] = x  # set the new input to be the last output
 
         # The first few are bad since the state value is nonsense.
         print("Prediction:")
@@ -0,0 +1,126 @@
+from __future__ import print_function, division
+import os
+import sys
+import time
+import numpy as np
+from numpy_lstm import NumpyLstm, crossEntropy
+from corpus_cache import loadCorpus
+
+# an int8 file format for the brains numpy_lstm.py runs, for shipping them to the machines that only sample
+# every column of every kernel (one gate unit) and of output_weight gets its own scale, so a column is stored as
+# round(column / scale) in int8 with scale = largest absolute value / 127. the biases stay float32, they are tiny
+# this only makes the file smaller (4x smaller than float32 weights, about 8x smaller than the checkpoint, which also
+# keeps the Adagrad slots), it doesn't make sampling faster: the weights are turned back into float32 when they're
+# loaded and run exactly like numpy_lstm.py's. numpy's integer matrix multiply doesn't use BLAS and is about 100x
+# slower than float32, so there is no faster int8 step to be had here
+#   python quantized_lstm.py brain/predict_2_dropout_2layer/model_layers_2_state_512.ckpt
+# writes the .int8.npz next to the brain and reports how much worse it predicts data/ts.valid.txt than float32
+
+quantized_version = 1  # bump this if the layout of the file changes
+valid_path = "data/ts.valid.txt"
+eval_streams = 64  # how many parts of the text are evaluated at once
+eval_chars = 0  # only evaluate the start of the text, 0 uses all of it
+speed_batch_size = 16
+speed_chars = 200
+
+
+def quantizeColumns(weight):
+    # returns (int8 values, float32 scale per column)
+    scale = np.max(np.abs(weight), axis=0) / 127
+    scale[scale == 0] = 1  # an all zero column stays zero with any scale
+    values = np.clip(np.round(weight / scale), -127, 127).astype(np.int8)
+    return values, scale.astype(np.float32)
+
+
+def dequantizeColumns(values, scale):
+    return values.astype(np.float32) * scale
+
+
+def quantizedPath(brain_path):
+    return brain_path + ".int8.npz"
+
+
+def saveQuantized(lstm, path):
+    # layers that share a cell (built as [cell] * num_layers) are only stored once, layer_cells says which cell each
+    # layer uses
+    cells = []
+    layer_cells = []
+    for kernel in lstm.kernels:
+        for cell_i in range(len(cells)):
+            if cells[cell_i] is kernel:
+                layer_cells.append(cell_i)
+                break
+        else:
+            layer_cells.append(len(cells))
+            cells.append(kernel)
+
+    arrays = {
+        "version": np.array(quantized_version),
+        "forget_bias": np.array(lstm.forget_bias, dtype=np.float32),
+        "layer_cells": np.array(layer_cells),
+        "output_bias": lstm.output_bias,
+    }
+    arrays["output_weight"], arrays["output_weight_scale"] = quantizeColumns(lstm.output_weight)
+    for cell_i in range(len(cells)):
+        layer = layer_cells.index(cell_i)
+        arrays["kernel_" + str(cell_i)], arrays["kernel_scale_" + str(cell_i)] = quantizeColumns(cells[cell_i])
+        arrays["bias_" + str(cell_i)] = lstm.biases[layer]
+
+    np.savez(path, **arrays)
+
+
+class QuantizedLstm(NumpyLstm):
+    def __init__(self, path):
+        # path: a file written by saveQuantized
+        saved = np.load(path)
+        if int(saved["version"]) != quantized_version:
+            raise ValueError(path + " is version " + str(int(saved["version"])) + ", expected " + str(quantized_version))
+        self.forget_bias = float(saved["forget_bias"])
+
+        layer_cells = list(saved["layer_cells"])
+        cell_kernels = {}
+        kernels = []
+        biases = []
+        for cell_i in layer_cells:
+            if cell_i not in cell_kernels:
+                cell_kernels[cell_i] = dequantizeColumns(saved["kernel_" + str(cell_i)], saved["kernel_scale_" + str(cell_i)])
+            kernels.append(cell_kernels[cell_i])
+            biases.append(saved["bias_" + str(cell_i)])
+
+        self.setWeights(kernels, biases, dequantizeColumns(saved["output_weight"], saved["output_weight_scale"]),
+                        saved["output_bias"])
+
+
+def samplingSpeed(lstm):
+    # characters per second generated for speed_batch_size streams
+    prompts = np.zeros((speed_batch_size, 1), dtype=np.int64)
+    start = time.time()
+    lstm.generate(prompts, speed_chars)
+    return speed_batch_size * speed_chars / (time.time() - start)
+
+
+def main():
+    brain_path = sys.argv[1]
+    path = quantizedPath(brain_path)
+
+    lstm = NumpyLstm(brain_path)
+    saveQuantized(lstm, path)
+
+    start = time.time()
+    quantized = QuantizedLstm(path)
+    load_time = time.time() - start
+
+    float_size = sum(array.nbytes for array in [lstm.output_weight, lstm.output_bias] +
+                     list(dict((id(array), array) for array in lstm.kernels + lstm.biases).values()))
+    print("float32 weights:", float_size // 1024, "KB, int8 file:", os.path.getsize(path) // 1024, "KB, loads in",
+          load_time, "seconds")
+
+    indices = loadCorpus(valid_path)
+    print("{:<10}{:>14}{:>14}{:>14}".format("weights", "nats/char", "bits/char", "chars/sec"))
+    for name, model in [("float32", lstm), ("int8", quantized)]:
+        loss = crossEntropy(model, indices, eval_streams, eval_chars)
+        print("{:<10}{:>14.4f}{:>14.4f}{:>14.0f}".format(name, loss, loss / np.log(2), samplingSpeed(model)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from __future__ import print_function, division
+import tensorflow as tf
+from tensorflow.contrib.framework import nest
+
+# builds the stacked recurrent layers for the scripts so the cell type is a setting instead of an edit
+# every backend takes and returns the state as one LSTMStateTuple(c, h) per layer, which is what the
+# [num_layers, 2, batch_size, state_size] state placeholders get unstacked into, so switching needs no other changes
+#
+# "lstm": tf.nn.rnn_cell.LSTMCell, what the scripts have always used
+# "basic_lstm": tf.nn.rnn_cell.BasicLSTMCell
+# "block": tf.contrib.rnn.LSTMBlockCell, one fused kernel per time step
+# "fused": tf.contrib.rnn.LSTMBlockFusedCell, one fused kernel for the whole sequence of a layer
+# "gru": tf.nn.rnn_cell.GRUCell, its single state is kept in both halves of the tuple
+# "basic_rnn": tf.nn.rnn_cell.BasicRNNCell, same as the GRU
+#
+# benchmark_cells.py compares them
+
+cell_backends = ["lstm", "basic_lstm", "block", "fused", "gru", "basic_rnn"]
+
+
+class SingleStateAdapter(tf.nn.rnn_cell.RNNCell):
+    # makes a GRU or plain RNN look like it has an LSTM state, it only reads h and writes its new state to both c and h
+    def __init__(self, cell):
+        super(SingleStateAdapter, self).__init__()
+        self._cell = cell
+
+    @property
+    def state_size(self):
+        return tf.nn.rnn_cell.LSTMStateTuple(self._cell.state_size, self._cell.state_size)
+
+    @property
+    def output_size(self):
+        return self._cell.output_size
+
+    def zero_state(self, batch_size, dtype):
+        state = self._cell.zero_state(batch_size, dtype)
+        return tf.nn.rnn_cell.LSTMStateTuple(state, state)
+
+    def __call__(self, inputs, state, scope=None):
+        output, new_state = self._cell(inputs, state.h, scope=scope)
+        return output, tf.nn.rnn_cell.LSTMStateTuple(new_state, new_state)
+
+
+class FusedStepCell(object):
+    # lets the fused layers be stepped one input at a time (for generation) like any other cell
+    def __init__(self, rnn):
+        self.rnn = rnn
+
+    def zero_state(self, batch_size, dtype):
+        return self.rnn.zero_state(batch_size, dtype)
+
+    def __call__(self, inputs, state):
+        outputs, state = self.rnn(tf.expand_dims(inputs, 0), state, time_major=True)
+        return outputs[0], state
+
+
+class SingleLayerCell(object):
+    # steps a single unwrapped layer with the same tuple of layer states the stacked version uses
+    def __init__(self, cell):
+        self._cell = cell
+
+    def zero_state(self, batch_size, dtype):
+        return (self._cell.zero_state(batch_size, dtype),)
+
+    def __call__(self, inputs, state):
+        output, state = self._cell(inputs, state[0])
+        return output, (state,)
+
+
+class StackedRnn(object):
+    def __init__(self, backend, state_size, num_layers, keep_prob=1.0, layer_names=None):
+        # keep_prob is applied to the output of every layer like DropoutWrapper(output_keep_prob=keep_prob)
+        # layer_names are optional names for the layers, leaving them out keeps the default variable names
+        if backend not in cell_backends:
+            raise ValueError("Unknown cell backend " + str(backend) + ", pick one of " + str(cell_backends))
+        if layer_names is None:
+            layer_names = [None] * num_layers
+
+        self.backend = backend
+        self.state_size = state_size
+        self.num_layers = num_layers
+        self.keep_prob = keep_prob
+
+        if backend == "fused":
+            self.layers = [tf.contrib.rnn.LSTMBlockFusedCell(state_size, name=layer_names[i])
+                           for i in range(num_layers)]
+            self.cell = FusedStepCell(self)
+            return
+
+        layers = []
+        for i in range(num_layers):
+            if backend == "lstm":
+                cell_i = tf.nn.rnn_cell.LSTMCell(state_size, state_is_tuple=True, name=layer_names[i])
+            elif backend == "basic_lstm":
+                cell_i = tf.nn.rnn_cell.BasicLSTMCell(state_size, state_is_tuple=True, name=layer_names[i])
+            elif backend == "block":
+                cell_i = tf.contrib.rnn.LSTMBlockCell(state_size, name=layer_names[i])
+            elif backend == "gru":
+                cell_i = SingleStateAdapter(tf.nn.rnn_cell.GRUCell(state_size, name=layer_names[i]))
+            else:
+                cell_i = SingleStateAdapter(tf.nn.rnn_cell.BasicRNNCell(state_size, name=layer_names[i]))
+
+            if keep_prob != 1.0:
+                cell_i = tf.nn.rnn_cell.DropoutWrapper(cell_i, output_keep_prob=keep_prob)
+            layers.append(cell_i)
+
+        # a single layer isn't wrapped so its variables keep the names a plain cell would have
+        self.layers = layers
+        if num_layers == 1:
+            self.cell = SingleLayerCell(layers[0])
+        else:
+            self.cell = tf.nn.rnn_cell.MultiRNNCell(layers, state_is_tuple=True)
+
+    def zero_state(self, batch_size, dtype):
+        return tuple([tf.nn.rnn_cell.LSTMStateTuple(tf.zeros([batch_size, self.state_size], dtype),
+                                                    tf.zeros([batch_size, self.state_size], dtype))
+                      for _ in range(self.num_layers)])
+
+    def __call__(self, inputs, initial_state=None, time_major=False):
+        # inputs: [batch_size, time, input_size], or [time, batch_size, input_size] if time_major
+        # initial_state: tuple of one LSTMStateTuple per layer, zeros if it is left out
+        # returns (outputs, final_state) like tf.nn.dynamic_rnn
+        if initial_state is None:
+            batch_axis = 1 if time_major else 0
+            initial_state = self.zero_state(tf.shape(inputs)[batch_axis], inputs.dtype)
+
+        if self.backend != "fused":
+            if self.num_layers == 1:
+                outputs, state = tf.nn.dynamic_rnn(cell=self.layers[0], inputs=inputs, initial_state=initial_state[0],
+                                                   time_major=time_major)
+                return outputs, (state,)
+            return tf.nn.dynamic_rnn(cell=self.cell, inputs=inputs, initial_state=initial_state, time_major=time_major)
+
+        # the fused kernels only take time major inputs
+        outputs = inputs if time_major else tf.transpose(inputs, [1, 0, 2])
+        final_state = []
+        for i in range(self.num_layers):
+            outputs, state = self.layers[i](outputs, initial_state=tuple(initial_state[i]), dtype=inputs.dtype)
+            if self.keep_prob != 1.0:
+                outputs = tf.nn.dropout(outputs, keep_prob=self.keep_prob)
+            final_state.append(tf.nn.rnn_cell.LSTMStateTuple(state[0], state[1]))
+
+        if not time_major:
+            outputs = tf.transpose(outputs, [1, 0, 2])
+        return outputs, tuple(final_state)
+
+
+def projectSeries(outputs, weight, bias):
+    # applies the same output layer to every time step of every series with one matmul
+    # outputs: [batch_size, time, size] (or time major, only the last axis matters), weight: [size, classes]
+    # returns [batch_size, time, classes], the batch and time sizes can be unknown until the graph runs
+    size = int(weight.shape[0])
+    classes = int(weight.shape[1])
+    flat = tf.matmul(tf.reshape(outputs, [-1, size]), weight) + bias
+    return tf.reshape(flat, tf.concat([tf.shape(outputs)[:-1], [classes]], axis=0))
+
+
+def timeDistributedLinear(outputs, num_outputs, activation_fn=None, scope="projection"):
+    # the same dense layer on every time step, like tf.map_fn(layers.linear, outputs) but with one matmul for all the
+    # steps instead of a while loop with one small matmul per step, so the number of ops doesn't grow with the length
+    # the weights start like layers.linear's (glorot uniform weights, zero biases)
+    with tf.variable_scope(scope):
+        weight = tf.get_variable("weights", [int(outputs.shape[-1]), num_outputs], dtype=tf.float32)
+        bias = tf.get_variable("biases", [num_outputs], dtype=tf.float32, initializer=tf.zeros_initializer())
+    projected = projectSeries(outputs, weight, bias)
+    return projected if activation_fn is None else activation_fn(projected)
+
+
+class ResidentState(object):
+    # keeps the state carried from one training window to the next in variables inside the graph, instead of
+    # fetching it after every run and feeding it straight back in through the init_state placeholder
+    # the state can have any structure: one variable is made for every tensor nest.flatten finds in it, so a tuple of
+    # LSTMStateTuples, a GRU's single tensor or anything else a cell takes all work the same way
+    # they are local variables, so tf.train.Saver leaves them out of the checkpoints. run
+    # tf.local_variables_initializer() (or reset) before using them
+    def __init__(self, template, name="resident_state"):
+        # template: a state of the right structure, shapes and dtypes, like rnn.zero_state(batch_size, tf.float32).
+        #   only its shapes are used, they have to be fully known
+        leaves = nest.flatten(template)
+        self.variables = [tf.Variable(tf.zeros(leaf.shape, leaf.dtype), trainable=False,
+                                      collections=[tf.GraphKeys.LOCAL_VARIABLES], name=name + "_" + str(i))
+                          for i, leaf in enumerate(leaves)]
+        # the state to start the run from, in the structure of template
+        self.state = nest.pack_sequence_as(template, [variable.read_value() for variable in self.variables])
+        # run at epoch or stream boundaries
+        self.reset = tf.group(*[tf.assign(variable, tf.zeros_like(variable)) for variable in self.variables])
+
+    def update(self, final_state, after):
+        # stores final_state (same structure as the template) for the next run. it only happens once everything in
+        # after (the train step) is done, so nothing in this run can still be reading the old value when it gets
+        # overwritten
+        with tf.control_dependencies(after):
+            return tf.group(*[tf.assign(variable, leaf)
+                              for variable, leaf in zip(self.variables, nest.flatten(final_state))])
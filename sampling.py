@@ -0,0 +1,48 @@
+from __future__ import print_function, division
+import numpy as np
+
+# picks output classes from the predictions of a whole batch of streams at once
+# every row is a probability vector, a cumulative sum turns each row into steps from 0 to its total and a single
+# uniform draw per row is compared against them, so there is no python loop over the classes
+
+
+def sample(probabilities, rng=None, trim=0, top_k=0, temperature=1.0):
+    # probabilities has shape [batch_size, classes] (a single [classes] vector is treated as a batch of 1)
+    # rng is anything with random_sample, pass np.random.RandomState(seed) to get the same picks every run
+    # trim: probabilities below this are never picked
+    # top_k: only the k most likely classes of each row can be picked, 0 keeps them all
+    # temperature: above 1 flattens the probabilities (more random), below 1 sharpens them (more confident)
+    # returns an int array of picked class indices with shape [batch_size]
+    # a row with nothing above 0 (or NaNs) raises a ValueError, a row that trim or temperature empties out picks its
+    # most likely class instead
+    if rng is None:
+        rng = np.random
+
+    values = np.array(probabilities, dtype=np.float64, ndmin=2)  # always a copy, so the caller's array is untouched
+    classes = values.shape[1]
+    empty_rows = ~(np.max(values, axis=1) > 0)
+    if np.any(empty_rows):
+        raise ValueError("Can't sample from rows without any probability: " + str(np.nonzero(empty_rows)[0]))
+    original = values.copy()
+
+    if temperature != 1.0:
+        values **= 1.0 / temperature  # same as dividing the logits by temperature before the softmax
+
+    if trim != 0:  # trim some values off
+        values[values < trim] = 0
+
+    if 0 < top_k < classes:
+        kth_largest = np.partition(values, classes - top_k, axis=1)[:, classes - top_k]
+        values[values < kth_largest[:, np.newaxis]] = 0
+
+    cumulative = np.cumsum(values, axis=1)
+    rand = rng.random_sample(len(values)) * cumulative[:, -1]
+
+    # the pick is the first class whose running total reaches rand, which is how many totals are still below it
+    picks = np.sum(cumulative < rand[:, np.newaxis], axis=1)
+    picks = np.minimum(picks, classes - 1)  # if rand happens to be just higher than the last total, handle that
+
+    emptied = ~(cumulative[:, -1] > 0)  # everything was trimmed off, or underflowed at a low temperature
+    picks[emptied] = np.argmax(original[emptied], axis=1)
+    return picks
+
@@ -1,5 +1,6 @@
 import tensorflow as tf
 from tensorflow.examples.tutorials.mnist import input_data
+from evaluation import ChunkedEvaluator, correctCount
 mnist = input_data.read_data_sets("/tmp/data/", one_hot=True)
 import pysc2.bin.agent as t
 
@@ -65,14 +66,19 @@ if load:
 
 training_epochs = 38
 batch_size = 100
+eval_chunk_size = 1000  # the test set is evaluated this many images at a time
 
-with sess.as_default():
-    pred = tf.nn.softmax(network)  # Apply softmax to logits
-    correct_prediction = tf.equal(tf.argmax(pred, 1), tf.argmax(outputType, 1))
-    accuracy = tf.reduce_mean(tf.cast(correct_prediction, "float"))
-    # first = mnist.test.images[:100]
-    # reshape = np.reshape(first, [100, 28, 28, 1])
-    print("Pre-training accuracy:", accuracy.eval({inputType: mnist.test.images, outputType: mnist.test.labels}))
+pred = tf.nn.softmax(network)  # Apply softmax to logits
+evaluator = ChunkedEvaluator(sess, {"accuracy": correctCount(pred, outputType)}, eval_chunk_size)
+
+
+def testAccuracy():
+    return evaluator.evaluateArrays([inputType, outputType], [mnist.test.images, mnist.test.labels])["accuracy"]
+
+
+# first = mnist.test.images[:100]
+# reshape = np.reshape(first, [100, 28, 28, 1])
+print("Pre-training accuracy:", testAccuracy())
 
 # Train the network for N training events.
 if train:
@@ -117,13 +123,7 @@ if train:
 #     accuracy = accuracyCalc.eval({inputType: inputs, outputType: outputs})
 #     print("Accuracy:", accuracy)
 
-with sess.as_default():
-    pred = tf.nn.softmax(network)  # Apply softmax to logits
-    correct_prediction = tf.equal(tf.argmax(pred, 1), tf.argmax(outputType, 1))
-    accuracy = tf.reduce_mean(tf.cast(correct_prediction, "float"))
-    # first = mnist.test.images[:100]
-    # reshape = np.reshape(first, [100, 28, 28, 1])
-    print("Accuracy:", accuracy.eval({inputType: mnist.test.images, outputType: mnist.test.labels}))
+print("Accuracy:", testAccuracy())
 
 # Save the trained network values and write to the tensorboard.
 if save:
@@ -0,0 +1,36 @@
+from __future__ import print_function, division
+import numpy as np
+
+# TinyShakespeareDataset style batching for the char level LSTMs
+# the corpus is cut into batch_size contiguous shards and row b of every batch continues exactly where row b of the
+# batch before it stopped. that way the state coming out of one window is the right state to start the next one
+# with, and one epoch is one pass over the whole corpus instead of a single random window
+
+
+class StreamBatcher(object):
+    def __init__(self, indices, batch_size, bpl, shift=1):
+        # indices: 1d array of class indices for the whole corpus, a memory mapped one is fine since only views are taken
+        # shift: how far ahead of the inputs the answers are, 1 means predict the next character
+        self.batch_size = batch_size
+        self.bpl = bpl
+
+        self.shard_length = (len(indices) - shift) // batch_size
+        used = batch_size * self.shard_length
+        self.inputs = indices[:used].reshape((batch_size, self.shard_length))
+        self.outputs = indices[shift:shift + used].reshape((batch_size, self.shard_length))
+
+        # leaves room for any offset below bpl, so every epoch has the same number of windows
+        self.num_windows = (self.shard_length - bpl + 1) // bpl
+
+    def windows(self, offset=0):
+        # yields (inputs, outputs) class index views of shape [batch_size, bpl], in order, for one pass over the corpus
+        # offset (below bpl) moves where the windows are cut, so the text isn't always split at the same places
+        for window_i in range(self.num_windows):
+            start = offset + window_i * self.bpl
+            end = start + self.bpl
+            yield self.inputs[:, start:end], self.outputs[:, start:end]
+
+    def randomOffset(self, rng=None):
+        if rng is None:
+            rng = np.random
+        return rng.randint(0, self.bpl)